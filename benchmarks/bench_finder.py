@@ -0,0 +1,202 @@
+"""
+Benchmark of architecture_finder.find_architecture against the fake NLU server.
+
+For each finder mode and each amount of requirements it runs several searches and reports round
+trips, combinations, wall time percentiles and peak memory as JSON, so a change to the finder can
+be compared against a saved baseline. The incremental mode replays a conversation with one
+requirement per turn instead, and reports the totals of all its turns next to the ones of an
+exhaustive finder replaying the same turns.
+
+Usage:
+
+    python -m benchmarks.bench_finder --sizes 3-12 --latency-ms 2 --output baseline.json
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from math import comb
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.fake_nlu_server import FakeNLUServer, add_arguments, from_arguments
+from tour.arch_designer import architecture_finder
+from tour.arch_search import MIN_COMBINATION_SIZE, BeamSearch
+from tour.nlu.scorer import BatchScorer, ConcurrentScorer, HttpScorer, Scorer
+
+MODES = ("sequential", "concurrent", "batch", "beam", "incremental")
+WORDS = ("los", "datos", "mensajes", "se", "envian", "al", "servidor", "cliente", "base", "cola", "procesados",
+         "por", "modulo", "capa", "filtro", "api", "usuario", "eventos", "respuesta", "banco", "reporte")
+
+
+def scorer_factories(url: str, args: argparse.Namespace) -> Dict[str, Callable[[], Scorer]]:
+    return {
+        "sequential": lambda: HttpScorer(url + "/model/parse"),
+        "concurrent": lambda: ConcurrentScorer(url + "/model/parse", max_in_flight=args.max_in_flight),
+        "batch": lambda: BatchScorer(url + "/model/parse_batch", batch_size=args.batch_size),
+        "beam": lambda: HttpScorer(url + "/model/parse"),
+        "incremental": lambda: HttpScorer(url + "/model/parse"),
+    }
+
+
+def make_requirements(amount: int, rnd: random.Random) -> List[str]:
+    return [" ".join(rnd.choice(WORDS) for _ in range(8)) for _ in range(amount)]
+
+
+def expected_combinations(held: int, scored: int) -> int:
+    """
+    Combinations a search scores when the finder holds held requirements and the first scored of
+    them were scored by a previous search, the incremental finder keeping their combinations.
+    """
+    if held < MIN_COMBINATION_SIZE:
+        return 0
+    return sum(comb(held, r) - comb(scored, r) for r in range(MIN_COMBINATION_SIZE, held + 1))
+
+
+def replay_turn(finder: architecture_finder, requirement: str, scored: int) -> Dict[str, Any]:
+    """
+    Adds a requirement and looks for an architecture, like NodeRequirement does on a turn, and checks
+    that the search scored the combinations it should have.
+    """
+    round_trips, combinations = finder.scorer.round_trips, finder.stats["combinations"]
+    start = time.perf_counter()
+    finder.add_requirement(requirement)
+    held = len(finder.user_requirements)
+    name = finder.find_architecture()
+    seconds = time.perf_counter() - start
+    combinations = finder.stats["combinations"] - combinations
+    expected = expected_combinations(held, scored)
+    if combinations != expected:
+        raise AssertionError("Scored {} combinations of {} requirements instead of {}".format(
+            combinations, held, expected))
+    return {"seconds": seconds, "round_trips": finder.scorer.round_trips - round_trips,
+            "combinations": combinations, "architecture": name}
+
+
+def run_conversation(scorer: Scorer, reference_scorer: Scorer, requirements: List[str]) -> Dict[str, Any]:
+    """
+    Replays a conversation giving one requirement per turn on an incremental finder and, on the
+    same turns, on an exhaustive one, like compare_finders does. Reports the totals of every turn
+    of both, since each search uses up the requirements it finds and a single turn often holds
+    too few of them to search.
+    """
+    finders = {"incremental": architecture_finder(scorer=scorer, incremental=True),
+               "exhaustive": architecture_finder(scorer=reference_scorer)}
+    totals = {key: {"seconds": 0.0, "round_trips": 0, "combinations": 0} for key in finders}
+    for requirement in requirements:
+        for key, finder in finders.items():
+            # The exhaustive finder keeps no scores between searches.
+            scored = len(finder.user_requirements) if key == "incremental" else 0
+            turn = replay_turn(finder, requirement, scored)
+            for counter in ("seconds", "round_trips", "combinations"):
+                totals[key][counter] += turn[counter]
+    found = finders["incremental"].found_architectures
+    return dict(totals["incremental"], exhaustive=totals["exhaustive"],
+                architecture=finders["incremental"].get_last_architecture(),
+                requirements=found[len(found)]["requirements"] if found else [])
+
+
+def run_search(mode: str, scorer: Scorer, requirements: List[str], args: argparse.Namespace,
+               reference_scorer: Optional[Scorer] = None) -> Dict[str, Any]:
+    """
+    Runs one search with the given mode. The incremental mode replays the conversation instead,
+    see run_conversation.
+    """
+    if mode == "incremental":
+        return run_conversation(scorer, reference_scorer, requirements)
+    if mode == "beam":
+        finder = architecture_finder(list(requirements), scorer,
+                                     BeamSearch(beam_width=args.beam_width, budget=args.budget,
+                                                confidence_threshold=args.confidence_threshold))
+    else:
+        finder = architecture_finder(list(requirements), scorer)
+    round_trips, combinations = scorer.round_trips, finder.stats["combinations"]
+    start = time.perf_counter()
+    name = finder.find_architecture()
+    seconds = time.perf_counter() - start
+    found = finder.found_architectures
+    return {"seconds": seconds, "round_trips": scorer.round_trips - round_trips,
+            "combinations": finder.stats["combinations"] - combinations, "architecture": name,
+            "requirements": found[len(found)]["requirements"] if name is not None else []}
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def bench(mode: str, factory: Callable[[], Scorer], size: int, args: argparse.Namespace) -> Dict[str, Any]:
+    scorer = factory()
+    reference_scorer = factory() if mode == "incremental" else None
+    runs = []
+    for repeat in range(args.repeats):
+        requirements = make_requirements(size, random.Random("{}-{}".format(size, repeat)))
+        runs.append(run_search(mode, scorer, requirements, args, reference_scorer))
+    # Memory is measured on a separate run, tracemalloc would distort the timings.
+    tracemalloc.start()
+    run_search(mode, scorer, make_requirements(size, random.Random("{}-0".format(size))), args, reference_scorer)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result = {"mode": mode, "requirements": size, "repeats": args.repeats}
+    result.update(summarize(runs))
+    if mode == "incremental":
+        result["turns"] = size
+        result["exhaustive"] = summarize([run["exhaustive"] for run in runs])
+    result["peak_memory_bytes"] = peak
+    result["winners"] = [[run["architecture"], run["requirements"]] for run in runs]
+    return result
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    seconds = [run["seconds"] for run in runs]
+    return {"round_trips": sum(run["round_trips"] for run in runs) / len(runs),
+            "combinations": sum(run["combinations"] for run in runs) / len(runs),
+            "seconds": {"mean": sum(seconds) / len(seconds), "p50": percentile(seconds, 0.50),
+                        "p95": percentile(seconds, 0.95), "p99": percentile(seconds, 0.99)}}
+
+
+def parse_sizes(text: str) -> List[int]:
+    if "-" in text:
+        first, last = text.split("-")
+        return list(range(int(first), int(last) + 1))
+    return [int(size) for size in text.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of architecture_finder.find_architecture.")
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma separated, any of " + ", ".join(MODES))
+    parser.add_argument("--sizes", default="3-16", help="Amounts of requirements, like 3-16 or 4,8,12")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--beam-width", type=int, default=5)
+    parser.add_argument("--budget", type=int, default=200)
+    parser.add_argument("--confidence-threshold", type=float, default=None)
+    parser.add_argument("--output", help="File to write the JSON report to, stdout by default")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    with FakeNLUServer(from_arguments(args)) as server:
+        factories = scorer_factories(server.url, args)
+        results = []
+        for mode in args.modes.split(","):
+            for size in parse_sizes(args.sizes):
+                results.append(bench(mode, factories[mode], size, args))
+                print("{:12} {:3} requirements: {:.4f}s p50".format(mode, size, results[-1]["seconds"]["p50"]),
+                      file=sys.stderr)
+        report = {"python": platform.python_version(),
+                  "arguments": vars(args),
+                  "server": {"requests": server.nlu.requests, "texts": server.nlu.texts},
+                  "results": results}
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark of the overhead of tour.chain.profiling.
+
+Selects the node of every turn of tests/test_dispatch.py with the chain built by
+functions_builder, its decision table and an AdaptiveChain, each one with and without profiling,
+and reports the time per turn as JSON.
+
+Usage:
+
+    python -m benchmarks.bench_profiling --repeats 200
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from tests.test_dispatch import turns
+from tour.arch_designer import FinderSessions
+from tour.chain.adaptive import AdaptiveChain
+from tour.chain.context import TurnContext
+from tour.chain.dispatch import Dispatcher
+from tour.chain.node import Node
+from tour.chain.profiling import ChainProfiler
+from tour.flows.registry import FlowRegistry
+from tour.loading_script import functions_builder
+
+RUNTIMES: Dict[str, Callable[[Node], Any]] = {"chain": lambda chain: chain,
+                                              "table": Dispatcher,
+                                              "adaptive": AdaptiveChain}
+
+
+def bench(runtime: Any, played: List[Tuple[Any, Any]], repeats: int) -> float:
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for it, tracker in played:
+            runtime.select(TurnContext(it, tracker))
+        seconds = (time.perf_counter() - start) / len(played)
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the overhead of the chain profiling.")
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--output", help="File to write the JSON report to, stdout by default")
+    args = parser.parse_args()
+
+    chain = functions_builder(FinderSessions(), FlowRegistry({}))
+    played = list(turns(Dispatcher(chain)))
+    results = []
+    for name, build in RUNTIMES.items():
+        plain = bench(build(chain), played, args.repeats)
+        profiled = bench(build(ChainProfiler().instrument(chain)), played, args.repeats)
+        results.append({"runtime": name, "turns": len(played), "plain_us": plain * 1e6,
+                        "profiled_us": profiled * 1e6, "overhead_us": (profiled - plain) * 1e6})
+        print("{:9} plain {:6.2f}us profiled {:6.2f}us".format(name, plain * 1e6, profiled * 1e6), file=sys.stderr)
+    report = {"python": platform.python_version(), "arguments": vars(args), "results": results}
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark of EqualPenultimateIntent on conversations of several lengths.
+
+For each length it plays turns of four events on a tracker and checks the criterion every turn:
+as it was before RecentEvents, reading the last events from the tracker, and with the events kept
+up to date by the caller like the policy does. Reports the time per turn of each one as JSON.
+
+Usage:
+
+    python -m benchmarks.bench_recent_events --events 10,1000,10000 --turns 200
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from typing import Any, Dict, List
+
+from rasa.shared.core.events import ActionExecuted, BotUttered, UserUttered
+from rasa.shared.core.trackers import DialogueStateTracker
+
+from tour.chain.context import TurnContext
+from tour.chain.criterion import EqualPenultimateIntent
+from tour.chain.recent_events import RecentEvents
+from tour.conversation_flow.concrete_learning_styles_flows import Sequential
+
+MODES = ("copying", "tracker", "incremental")
+
+
+class CopyingEqualPenultimateIntent(EqualPenultimateIntent):
+    """
+    EqualPenultimateIntent as it was before RecentEvents, kept as the baseline.
+    """
+    def check(self, context: TurnContext) -> bool:
+        tracker = context.tracker
+        if len(tracker.as_dialogue().events) > 5:
+            penultimate_intent = str(tracker.as_dialogue().events[-4])
+        else:
+            penultimate_intent = None
+        return penultimate_intent is not None and penultimate_intent.find(self._compare) != -1
+
+
+def turn(index: int) -> List[Any]:
+    utter = "utter_final" if index % 7 == 0 else "utter_topic_{}".format(index)
+    return [ActionExecuted(utter),
+            BotUttered("explicacion {}".format(index), metadata={"utter_action": utter}),
+            ActionExecuted("action_listen"),
+            UserUttered("si", {"name": "affirm", "confidence": 1.0})]
+
+
+def bench(events: int, turns: int) -> Dict[str, Any]:
+    history = [event for index in range(events // 4 + 1) for event in turn(index)][:events]
+    result = {"events": events, "turns": turns}
+    expected = None
+    for mode in MODES:
+        tracker = DialogueStateTracker.from_events("bench", history)
+        criterion = (CopyingEqualPenultimateIntent if mode == "copying" else EqualPenultimateIntent)("utter_final")
+        recent_events = RecentEvents.from_events(tracker.events) if mode == "incremental" else None
+        it = Sequential({}, [])
+        checks, seconds = [], []
+        for index in range(turns):
+            for event in turn(index):
+                tracker.update(event)
+            start = time.perf_counter()
+            if recent_events is not None:
+                recent_events.update(tracker.events)
+            checks.append(criterion.check(TurnContext(it, tracker, recent_events)))
+            seconds.append(time.perf_counter() - start)
+        if expected is not None and checks != expected:
+            raise AssertionError("The {} criterion disagrees with {} events".format(mode, events))
+        expected = checks
+        seconds.sort()
+        result[mode] = {"mean_us": sum(seconds) / turns * 1e6, "p95_us": seconds[int(turns * 0.95)] * 1e6}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of EqualPenultimateIntent.")
+    parser.add_argument("--events", default="10,1000,10000", help="Events of the conversations before the turns")
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--output", help="File to write the JSON report to, stdout by default")
+    args = parser.parse_args()
+
+    results = []
+    for events in (int(events) for events in args.events.split(",") if events):
+        results.append(bench(events, args.turns))
+        print("{:6} events {}".format(events, " ".join("{} {:8.2f}us".format(mode, results[-1][mode]["mean_us"])
+                                                        for mode in MODES)), file=sys.stderr)
+    report = {"python": platform.python_version(), "arguments": vars(args), "results": results}
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark of the encoding of conversation flow progress.
+
+For generated flows of several sizes it advances a conversation of each learning style part of the
+way, then reports the encoded size and the encode and decode time as JSON. Every encoding is
+decoded and checked against the original conversation first.
+
+Usage:
+
+    python -m benchmarks.bench_serialization --sizes 3,100,1000,10000 --repeats 1000
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from typing import Any, Dict
+
+from benchmarks.bench_traversal import STYLES, generate_flow
+from tour.conversation_flow.conversation_flow import ConversationFlow
+from tour.conversation_flow.serialization import dumps, dumps_text, loads
+from tour.flows.compiled import CompiledFlow
+from tour.visitor.next_topic import NextTopic
+
+
+def progress(it: ConversationFlow) -> Any:
+    state = it.get_flow_state()
+    return ([topic.get_id() for topic in it.iter_to_explain()], it.export_to_explain(), bytes(state.explained),
+            [getattr(state, cursor).tolist() for cursor in
+             ("detail_level", "current_example", "current_sub_topic", "current_question")])
+
+
+def bench(flow: CompiledFlow, style: str, advance: float, repeats: int) -> Dict[str, Any]:
+    it = STYLES[style]({}, flow.instantiate())
+    for _ in range(int(advance * len(flow))):
+        if it.accept(NextTopic()) == "utter_final":
+            break
+    flows = {flow.name: flow}
+    data = dumps(it)
+    if progress(loads(data, flows)) != progress(it):
+        raise AssertionError("Round trip changed the progress of {} with style {}".format(flow.name, style))
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        dumps(it)
+    encode = (time.perf_counter() - start) / repeats
+    start = time.perf_counter()
+    for _ in range(repeats):
+        loads(data, flows)
+    decode = (time.perf_counter() - start) / repeats
+    return {"topics": len(flow), "style": style, "bytes": len(data), "text_bytes": len(dumps_text(it)),
+            "encode_us": encode * 1e6, "decode_us": decode * 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the conversation flow progress encoding.")
+    parser.add_argument("--sizes", default="3,100,1000,10000", help="Approximate amounts of topics")
+    parser.add_argument("--advance", type=float, default=0.5, help="Fraction of the topics explained")
+    parser.add_argument("--repeats", type=int, default=1000)
+    parser.add_argument("--output", help="File to write the JSON report to, stdout by default")
+    args = parser.parse_args()
+
+    results = []
+    for size in (int(size) for size in args.sizes.split(",")):
+        # Top level topics with 3 levels of 2 sub topics, 15 topics each.
+        flow = generate_flow(max(size // 15, 1), 3, 2)
+        flow.name = "generated{}".format(size)
+        for style in STYLES:
+            results.append(bench(flow, style, args.advance, max(args.repeats * 100 // max(len(flow), 100), 1)))
+            print("{:6} topics {:10} {:6} bytes encode {:8.1f}us decode {:8.1f}us".format(
+                len(flow), style, results[-1]["bytes"], results[-1]["encode_us"], results[-1]["decode_us"]),
+                file=sys.stderr)
+    report = {"python": platform.python_version(), "arguments": vars(args), "results": results}
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
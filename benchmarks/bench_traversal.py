@@ -0,0 +1,133 @@
+"""
+Benchmark of a full NextTopic traversal on generated deep and wide flows.
+
+Compares the visitor against CopyingNextTopic, the previous visitor that copied the topics to
+explain on every access, and reports the time per traversal of each one as JSON.
+
+Usage:
+
+    python -m benchmarks.bench_traversal --deep 100,500,2000 --wide 100x5,1000x5 --repeats 5
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from typing import Any, Dict, List
+
+from tour.conversation_flow.concrete_learning_styles_flows import Global, Sequential
+from tour.conversation_flow.conversation_flow import ConversationFlow
+from tour.flows.compiled import CompiledFlow
+from tour.visitor.next_topic import NextTopic
+
+STYLES = {"sequential": Sequential, "global": Global}
+
+
+class CopyingNextTopic(NextTopic):
+    """
+    NextTopic as it was before ConversationFlow.peek, kept as the baseline.
+    """
+    def visit_sequential(self, it: ConversationFlow) -> str:
+        while len(it.get_to_explain()) > 0 and (it.get_to_explain()[-1].is_explained or it.topic_in_flow(it.get_to_explain()[-1])):
+            it.get_to_explain()[-1].get_explanation()
+            next_to_explain = it.get_to_explain()[-1].next()
+            if next_to_explain is None:
+                it.pop_not_explained_topic()
+            else:
+                it.append_topic_to_explain(next_to_explain)
+
+        if len(it.get_to_explain()) == 0:
+            return "utter_final"
+
+        return it.get_to_explain()[-1].get_explanation()
+
+    def visit_global(self, it: ConversationFlow) -> str:
+        if it.get_to_explain()[-1].is_explained:
+            it.pop_not_explained_topic()
+        if len(it.get_to_explain()) == 0:
+            return "utter_final"
+        return it.get_to_explain()[-1].get_explanation()
+
+
+def generate_flow(roots: int, depth: int, branching: int) -> CompiledFlow:
+    """
+    Flow with roots top level topics, each one the root of a tree with the given depth where every
+    topic has branching sub topics. Built without recursion, so it can be as deep as needed.
+    """
+    ids, utters, children, root_indexes = [], [], [], []
+    pending = [(None, 0)] * roots
+    while pending:
+        parent, level = pending.pop()
+        index = len(ids)
+        ids.append("topic_{}".format(index))
+        utters.append(("utter_{}_short".format(index), "utter_{}_long".format(index)))
+        children.append([])
+        if parent is None:
+            root_indexes.append(index)
+        else:
+            children[parent].append(index)
+        if level < depth:
+            pending.extend([(index, level + 1)] * branching)
+    empty = tuple(() for _ in ids)
+    return CompiledFlow("generated", tuple(ids), tuple(utters), empty, empty,
+                        tuple(tuple(sub_topics) for sub_topics in children), tuple(root_indexes))
+
+
+def traverse(flow: CompiledFlow, style: str, visitor: NextTopic) -> List[str]:
+    it = STYLES[style]({}, [])
+    it.load(flow.instantiate())
+    utters = [it.accept(visitor)]
+    while utters[-1] != "utter_final":
+        utters.append(it.accept(visitor))
+    return utters
+
+
+def bench(name: str, flow: CompiledFlow, style: str, repeats: int) -> Dict[str, Any]:
+    result = {"flow": name, "topics": len(flow), "style": style}
+    expected = None
+    for label, visitor in (("copying", CopyingNextTopic()), ("current", NextTopic())):
+        seconds = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            utters = traverse(flow, style, visitor)
+            seconds.append(time.perf_counter() - start)
+        if expected is not None and utters != expected:
+            raise AssertionError("The visitors disagree on flow {} with style {}".format(name, style))
+        expected = utters
+        result[label] = {"best": min(seconds), "mean": sum(seconds) / len(seconds)}
+    result["steps"] = len(expected)
+    result["speedup"] = result["copying"]["best"] / result["current"]["best"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of NextTopic traversals.")
+    parser.add_argument("--deep", default="100,500,2000", help="Depths of single chain flows")
+    parser.add_argument("--wide", default="100x5,1000x5", help="ROOTSxSUBTOPICS of two level flows")
+    parser.add_argument("--styles", default=",".join(STYLES))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="File to write the JSON report to, stdout by default")
+    args = parser.parse_args()
+
+    flows = [("deep{}".format(depth), generate_flow(1, int(depth), 1)) for depth in args.deep.split(",") if depth]
+    for size in (size for size in args.wide.split(",") if size):
+        roots, sub_topics = size.split("x")
+        flows.append(("wide{}".format(size), generate_flow(int(roots), 1, int(sub_topics))))
+
+    results = []
+    for name, flow in flows:
+        for style in args.styles.split(","):
+            results.append(bench(name, flow, style, args.repeats))
+            print("{:14} {:10} copying {:.4f}s current {:.4f}s".format(
+                name, style, results[-1]["copying"]["best"], results[-1]["current"]["best"]), file=sys.stderr)
+    report = {"python": platform.python_version(), "arguments": vars(args), "results": results}
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Stand-in for the architectures NLU server with configurable latency and confidences.
+
+Answers /model/parse, /model/parse_batch and /status. The parse result of a text only depends on
+the text and the seed, so repeated texts get the same intent and confidence, like a real model.
+
+Usage:
+
+    python -m benchmarks.fake_nlu_server -p 5001 --latency-ms 20 --latency-dist lognormal
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Sequence
+
+INTENTS = ("pipe", "layers", "tiers")
+LATENCY_DISTRIBUTIONS = ("constant", "uniform", "exponential", "lognormal")
+CONFIDENCE_DISTRIBUTIONS = ("uniform", "beta", "discrete")
+
+
+class FakeNLU:
+    """
+    Produces the parse results and the latencies of the stand-in server.
+    """
+    def __init__(self, latency_ms: float = 0.0, latency_dist: str = "constant", jitter: float = 0.5,
+                 confidence_dist: str = "uniform", beta: Sequence[float] = (2.0, 5.0), levels: int = 4,
+                 intents: Sequence[str] = INTENTS, seed: int = 0, model_file: str = "fake-model"):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+
+        latency_ms
+            Median latency added to each request.
+        latency_dist
+            One of LATENCY_DISTRIBUTIONS. jitter is the spread of uniform (fraction of the median)
+            and the sigma of lognormal.
+        confidence_dist
+            One of CONFIDENCE_DISTRIBUTIONS. beta are the (a, b) parameters of the beta distribution,
+            levels the amount of distinct confidences of discrete, which produces many ties.
+        intents
+            Intents returned.
+        seed
+            Changes every parse result.
+        model_file
+            Model reported by /status.
+        """
+        if latency_dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError("Unknown latency distribution {}".format(latency_dist))
+        if confidence_dist not in CONFIDENCE_DISTRIBUTIONS:
+            raise ValueError("Unknown confidence distribution {}".format(confidence_dist))
+        self.latency_ms = latency_ms
+        self.latency_dist = latency_dist
+        self.jitter = jitter
+        self.confidence_dist = confidence_dist
+        self.beta = beta
+        self.levels = levels
+        self.intents = list(intents)
+        self.seed = seed
+        self.model_file = model_file
+        self.requests = 0
+        self.texts = 0
+        self._latency_random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def latency(self) -> float:
+        """
+        Seconds to wait before answering a request.
+        """
+        median = self.latency_ms / 1000
+        with self._lock:
+            if self.latency_dist == "uniform":
+                return max(0.0, self._latency_random.uniform(median * (1 - self.jitter), median * (1 + self.jitter)))
+            if self.latency_dist == "exponential":
+                return self._latency_random.expovariate(math.log(2) / median) if median > 0 else 0.0
+            if self.latency_dist == "lognormal":
+                return median * self._latency_random.lognormvariate(0, self.jitter)
+        return median
+
+    def parse(self, text: str) -> Dict[str, Any]:
+        digest = hashlib.sha256("{}:{}".format(self.seed, text).encode("utf-8")).digest()
+        rnd = random.Random(digest)
+        scores = [self._confidence(rnd) for _ in self.intents]
+        total = sum(scores) or 1.0
+        ranking = sorted(({"name": name, "confidence": score / total} for name, score in zip(self.intents, scores)),
+                         key=lambda intent: -intent["confidence"])
+        intent = {"name": ranking[0]["name"], "confidence": self._confidence(rnd)}
+        return {"text": text, "intent": intent, "entities": [], "intent_ranking": ranking}
+
+    def _confidence(self, rnd: random.Random) -> float:
+        if self.confidence_dist == "beta":
+            return rnd.betavariate(*self.beta)
+        if self.confidence_dist == "discrete":
+            return rnd.randint(1, self.levels) / self.levels
+        return rnd.random()
+
+    def count(self, texts: int):
+        with self._lock:
+            self.requests += 1
+            self.texts += texts
+
+
+def make_handler(nlu: FakeNLU):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+        # Buffered so headers and body leave in one segment.
+        wbufsize = 65536
+
+        def do_GET(self):
+            if self.path == "/status":
+                self._reply(200, {"model_file": nlu.model_file})
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            time.sleep(nlu.latency())
+            if self.path == "/model/parse":
+                nlu.count(1)
+                self._reply(200, nlu.parse(body["text"]))
+            elif self.path == "/model/parse_batch":
+                nlu.count(len(body["texts"]))
+                self._reply(200, [nlu.parse(text) for text in body["texts"]])
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def _reply(self, status: int, payload: Any):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class FakeNLUServer:
+    """
+    Runs a FakeNLU in a background thread.
+    """
+    def __init__(self, nlu: FakeNLU, port: int = 0):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+
+        nlu
+            Behaviour of the server.
+        port
+            Port to listen on, 0 picks a free one.
+        """
+        self.nlu = nlu
+        self._server = ThreadingHTTPServer(("localhost", port), make_handler(nlu))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return "http://localhost:{}".format(self._server.server_address[1])
+
+    def start(self) -> "FakeNLUServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeNLUServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="constant")
+    parser.add_argument("--jitter", type=float, default=0.5)
+    parser.add_argument("--confidence-dist", choices=CONFIDENCE_DISTRIBUTIONS, default="uniform")
+    parser.add_argument("--beta", type=float, nargs=2, default=(2.0, 5.0))
+    parser.add_argument("--levels", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def from_arguments(args: argparse.Namespace) -> FakeNLU:
+    return FakeNLU(latency_ms=args.latency_ms, latency_dist=args.latency_dist, jitter=args.jitter,
+                   confidence_dist=args.confidence_dist, beta=args.beta, levels=args.levels, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in for the architectures NLU server.")
+    parser.add_argument("-p", "--port", type=int, default=5001)
+    add_arguments(parser)
+    args = parser.parse_args()
+    server = FakeNLUServer(from_arguments(args), args.port)
+    print("Fake NLU listening on {}".format(server.url))
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+The decision table of the chain built by functions_builder, and an AdaptiveChain reordering it, select
+the same node as the chain itself for every combination of the features the table reads and of the
+criteria it does not code.
+"""
+import itertools
+import random
+from types import SimpleNamespace
+from typing import Any, Iterator, List, Optional, Tuple
+
+from rasa.shared.core.events import ActionExecuted
+
+from tour.arch_designer import FinderSessions
+from tour.chain.adaptive import AdaptiveChain
+from tour.chain.context import TurnContext
+from tour.chain.criterion import EqualPenultimateIntent
+from tour.chain.dispatch import Dispatcher
+from tour.chain.profiling import ChainProfiler
+from tour.flows.registry import FlowRegistry
+from tour.loading_script import functions_builder
+
+
+class Flow:
+    """
+    Stands for a conversation flow, only its emptiness is read by the criteria.
+    """
+    def __init__(self, empty: bool):
+        self._empty = empty
+
+    def has_flow(self) -> bool:
+        return not self._empty
+
+
+class Tracker:
+    """
+    Stands for a Rasa tracker with the given features.
+    """
+    def __init__(self, action: Any, intent: Any, entity: Any, message: Any, penultimate: Optional[str]):
+        self.latest_action_name = action
+        self.latest_message = SimpleNamespace(text=message, intent={"name": intent})
+        self._entity = entity
+        # Only the 4th to last event is read, and only when there are more than 5 events.
+        self.events = [ActionExecuted("action_listen") for _ in range(6)]
+        if penultimate is not None:
+            self.events[-4] = ActionExecuted(penultimate)
+
+    def get_latest_entity_values(self, entity_type: str) -> Iterator[Any]:
+        return iter(() if self._entity is None else (self._entity,))
+
+    def __repr__(self) -> str:
+        return "action {!r} intent {!r} entity {!r} message {!r} 4th to last event {!r}".format(
+            self.latest_action_name, self.latest_message.intent["name"], self._entity, self.latest_message.text,
+            self.events[-4].action_name)
+
+
+def values(constants: List[Any]) -> List[Any]:
+    """
+    The constants a feature is compared with, and a value equal to none of them.
+    """
+    if all(isinstance(constant, bool) for constant in constants):
+        return constants + [value for value in (False, True) if value not in constants][:1]
+    other = "other"
+    while other in constants:
+        other += "_"
+    return constants + [other]
+
+
+def turns(dispatcher: Dispatcher) -> Iterator[Tuple[Flow, Tracker]]:
+    """
+    A turn for each combination of the features and of the results of the criteria that are not
+    coded. The combinations no turn can give are skipped.
+    """
+    features = dispatcher.get_features()
+    defaults = {"action": None, "intent": None, "entity": None, "empty_flow": False, "message": None}
+    opaque = dispatcher.get_opaque()
+    for feature_values in itertools.product(*(values(list(codes)) for codes in features.values())):
+        turn = dict(defaults, **dict(zip(features, feature_values)))
+        for outcome in itertools.product((False, True), repeat=len(opaque)):
+            penultimate = next((atom._compare for atom, result in zip(opaque, outcome)
+                                if result and isinstance(atom, EqualPenultimateIntent)), None)
+            it = Flow(turn["empty_flow"])
+            tracker = Tracker(turn["action"], turn["intent"], turn["entity"], turn["message"], penultimate)
+            if all(atom.check(TurnContext(it, tracker)) == result for atom, result in zip(opaque, outcome)):
+                yield it, tracker
+
+
+def chain():
+    return functions_builder(FinderSessions(), FlowRegistry({}))
+
+
+def test_table_selects_as_the_chain():
+    node = chain()
+    dispatcher = Dispatcher(node)
+    played = list(turns(dispatcher))
+    assert played
+    differences = ["{!r} empty flow {}: {} instead of {}".format(tracker, not it.has_flow(), type(result).__name__,
+                                                                 type(expected).__name__)
+                   for it, tracker in played
+                   for expected, result in [(node.select(TurnContext(it, tracker)),
+                                             dispatcher.select(TurnContext(it, tracker)))]
+                   if result is not expected]
+    assert differences == []
+
+
+def test_adaptive_chain_selects_as_the_chain():
+    # Some turns much more often than others, so the chain is reordered.
+    node, rnd = chain(), random.Random(0)
+    played = list(turns(Dispatcher(node)))
+    weights = [rnd.random() ** 8 for _ in played]
+    adaptive = AdaptiveChain(node, reorder_every=97)
+    orders, differences = set(), []
+    for it, tracker in rnd.choices(played, weights, k=20000):
+        expected = node.select(TurnContext(it, tracker))
+        result = adaptive.select(TurnContext(it, tracker))
+        orders.add(tuple(adaptive.get_order()))
+        if result is not expected:
+            differences.append("{!r} order {}: {} instead of {}".format(
+                tracker, [type(node).__name__ for node in adaptive.get_order()], type(result).__name__,
+                type(expected).__name__))
+    assert len(orders) > 1
+    assert differences == []
+
+
+def test_profiler_records_the_adaptive_chain():
+    profiler = ChainProfiler()
+    adaptive = AdaptiveChain(profiler.instrument(chain()), reorder_every=10)
+    profiler.track(adaptive)
+    played = list(turns(Dispatcher(chain())))
+    for it, tracker in played:
+        adaptive.select(TurnContext(it, tracker))
+    snapshot = profiler.snapshot()["adaptive"]
+    assert snapshot["reorders"] == len(played) // 10
+    assert sum(node["total_hits"] for node in snapshot["nodes"]) == len(played)
+    text = profiler.prometheus()
+    assert "tour_chain_adaptive_hits_total{" in text and "tour_chain_adaptive_position{" in text
@@ -0,0 +1,16 @@
+from tour import loading_script
+from tour.nlu.cache import CachedScorer
+from tour.nlu.scorer import HttpScorer
+
+
+def test_sessions_share_the_parse_cache():
+    finders = loading_script.default_finders()
+    first, second = finders.get("first").scorer, finders.get("second").scorer
+    assert isinstance(first, CachedScorer)
+    assert first is not second
+    assert first.cache is second.cache
+
+
+def test_parse_cache_disabled(monkeypatch):
+    monkeypatch.setattr(loading_script, "NLU_CACHE_MAX_ENTRIES", None)
+    assert isinstance(loading_script.default_finders().get("first").scorer, HttpScorer)
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+from tour.arch_designer import FinderSessions, architecture_finder
+from tour.conversation_flow.concrete_learning_styles_flows import Sequential
+from tour.flows.registry import FlowRegistry
+from tour.loading_script import functions_builder
+from tour.nlu.scorer import Scorer
+
+
+class FixedScorer(Scorer):
+    """
+    Classifies every combination as the same architecture.
+    """
+    def __init__(self, name: str):
+        super().__init__()
+        self._name = name
+
+    def score(self, combinations):
+        self.round_trips += len(combinations)
+        return [{"intent": {"name": self._name, "confidence": 0.9}} for _ in combinations]
+
+
+def turn(sender_id: str, message: str, intent: str = "requerimiento"):
+    return SimpleNamespace(sender_id=sender_id, latest_action_name="action_listen", events=[],
+                           latest_message=SimpleNamespace(text=message, intent={"name": intent}),
+                           get_latest_entity_values=lambda entity_type: iter(()))
+
+
+def chain(architecture: str, max_sessions: int = 1000):
+    finders = FinderSessions(lambda: architecture_finder(scorer=FixedScorer(architecture)), max_sessions=max_sessions)
+    return functions_builder(finders, FlowRegistry({"layers": "info/layers.json"}))
+
+
+def give_requirements(node, it, sender_id: str):
+    return [node.next(it, turn(sender_id, "requerimiento {}".format(i))) for i in range(3)]
+
+
+def test_explain_found_architecture():
+    node, it = chain("layers"), Sequential({}, [])
+    assert give_requirements(node, it, "alice")[-1] == "utter_architecture"
+    assert node.next(it, turn("alice", "A R Q U I T E C T U R A")).startswith("utter_")
+    assert it.has_flow()
+
+
+def test_explain_architecture_of_evicted_session():
+    node, it = chain("layers", max_sessions=1), Sequential({}, [])
+    give_requirements(node, it, "alice")
+    # Another conversation takes the only session.
+    give_requirements(node, Sequential({}, []), "bob")
+    assert node.next(it, turn("alice", "A R Q U I T E C T U R A")) == "utter_no_architecture"
+    assert not it.has_flow()
+
+
+def test_explain_architecture_without_flow():
+    node, it = chain("pipe"), Sequential({}, [])
+    assert give_requirements(node, it, "alice")[-1] == "utter_no_explain"
+    assert node.next(it, turn("alice", "A R Q U I T E C T U R A")) == "utter_no_explain"
+    assert not it.has_flow()
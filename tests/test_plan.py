@@ -0,0 +1,88 @@
+"""
+Following the plans of the compiled flows gives the same explanations, and leaves the same progress,
+as NextTopic searching for the next topic.
+"""
+import glob
+import os
+import random
+from typing import Any, List
+
+import pytest
+
+from tour.conversation_flow.concrete_learning_styles_flows import Global, Sequential
+from tour.conversation_flow.conversation_flow import ConversationFlow
+from tour.flows.catalog import FlowCatalog
+from tour.flows.compiled import CompiledFlow
+from tour.visitor.next_topic import NextTopic
+
+FLOWS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "info")
+STYLES = {"sequential": Sequential, "global": Global}
+OPERATIONS = ("next", "next", "next", "next", "repeat", "restart", "jump")
+
+
+def random_flow(rnd: random.Random, depth: int = 4, max_sub_topics: int = 4) -> CompiledFlow:
+    """
+    Flow with a random shape and up to 3 explanations per topic.
+    """
+    counter = iter(range(10 ** 9))
+
+    def topics(level: int) -> List[dict]:
+        return [{"topic_id": "topic_{}".format(next(counter)), "type": "simple",
+                 "utters": ["utter_{}".format(i) for i in range(rnd.randint(1, 3))],
+                 "sub_topics": topics(level + 1) if level < depth and rnd.random() < 0.6 else []}
+                for _ in range(rnd.randint(1, max_sub_topics))]
+
+    return CompiledFlow.from_raw("random", topics(0))
+
+
+def apply(it: ConversationFlow, operation: str, topic_id: str, planned: bool) -> Any:
+    try:
+        if operation == "next":
+            if planned:
+                return it.accept(NextTopic())
+            if isinstance(it, Sequential):
+                return NextTopic().visit_sequential(it)
+            return NextTopic().visit_global(it)
+        if operation == "repeat":
+            return it.repeat()
+        if operation == "restart":
+            return it.restart()
+        return it.jump_to_topic(it.get_intents_to_topic()[topic_id])
+    except IndexError:
+        return IndexError
+
+
+def progress(it: ConversationFlow) -> Any:
+    state = it.peek().get_state() if it.size() > 0 else None
+    return ([topic.get_id() for topic in it.iter_to_explain()],
+            None if state is None else (bytes(state.explained), state.detail_level.tolist(),
+                                        state.current_sub_topic.tolist()))
+
+
+def check_plan(flow: CompiledFlow, style: str, operations: int = 300, seed: int = 0):
+    """
+    Runs the same random operations on a conversation following the plan and on one using NextTopic.
+    """
+    rnd = random.Random(seed)
+    intents = {topic_id: topic_id for topic_id in flow.ids}
+    planned = STYLES[style](intents, flow.instantiate())
+    reference = STYLES[style](intents, flow.instantiate())
+    for step in range(operations):
+        operation, topic_id = rnd.choice(OPERATIONS), rnd.choice(flow.ids)
+        expected = apply(reference, operation, topic_id, False)
+        result = apply(planned, operation, topic_id, True)
+        assert result == expected, "step {}: {} {}".format(step, operation, topic_id)
+        assert progress(planned) == progress(reference), "step {}: {} {}".format(step, operation, topic_id)
+
+
+@pytest.mark.parametrize("style", STYLES)
+@pytest.mark.parametrize("name", sorted(os.path.splitext(os.path.basename(path))[0]
+                                        for path in glob.glob(os.path.join(FLOWS_DIR, "*.json"))))
+def test_flow_file(name, style):
+    check_plan(FlowCatalog(FLOWS_DIR).get(name), style)
+
+
+@pytest.mark.parametrize("style", STYLES)
+@pytest.mark.parametrize("seed", range(100))
+def test_random_flow(seed, style):
+    check_plan(random_flow(random.Random(seed)), style, seed=seed)
@@ -0,0 +1,124 @@
+import pytest
+
+from tour.conversation_flow.concrete_learning_styles_flows import Global, Sequential
+from tour.conversation_flow.serialization import COMPRESS_FROM, HEADER, StaleFlowState, dumps, dumps_text, loads, \
+    loads_text
+from tour.flows.compiled import CompiledFlow
+from tour.visitor.next_topic import NextTopic
+
+
+def raw_topics(roots: int, sub_topics: int) -> list:
+    return [{"topic_id": "topic_{}".format(i), "type": "simple", "utters": ["utter_{}_a".format(i), "utter_{}_b".format(i)],
+             "sub_topics": [{"topic_id": "topic_{}_{}".format(i, j), "type": "simple", "utters": ["utter_{}_{}".format(i, j)]}
+                            for j in range(sub_topics)]}
+            for i in range(roots)]
+
+
+def progress(it):
+    state = it.get_flow_state()
+    return (type(it), it.get_jump(), it.get_current_topic(), [topic.get_id() for topic in it.iter_to_explain()],
+            it.export_to_explain(), bytes(state.explained),
+            [getattr(state, cursor).tolist() for cursor in
+             ("detail_level", "current_example", "current_sub_topic", "current_question")])
+
+
+def next_topic(it):
+    try:
+        return it.accept(NextTopic())
+    except IndexError:
+        return IndexError
+
+
+def advanced(style, flow: CompiledFlow, steps: int):
+    it = style({}, flow.instantiate())
+    for _ in range(steps):
+        it.accept(NextTopic())
+    it.set_current_topic("topic_0")
+    it.set_jump(True)
+    return it
+
+
+@pytest.fixture
+def small():
+    return CompiledFlow.from_raw("small", raw_topics(3, 2))
+
+
+@pytest.fixture
+def large():
+    return CompiledFlow.from_raw("large", raw_topics(100, 3))
+
+
+@pytest.mark.parametrize("style", [Sequential, Global])
+def test_round_trip(style, small):
+    it = advanced(style, small, 2)
+    data = dumps(it)
+    assert not HEADER.unpack_from(data)[3]
+    restored = loads(data, {"small": small})
+    assert progress(restored) == progress(it)
+    assert next_topic(restored) == next_topic(it)
+    assert progress(restored) == progress(it)
+
+
+@pytest.mark.parametrize("style", [Sequential, Global])
+def test_round_trip_compressed(style, large):
+    it = advanced(style, large, 50)
+    data = dumps(it)
+    assert HEADER.unpack_from(data)[3]
+    assert len(large) * 9 >= COMPRESS_FROM
+    assert progress(loads(data, {"large": large})) == progress(it)
+
+
+def test_round_trip_text(small):
+    it = advanced(Sequential, small, 2)
+    assert progress(loads_text(dumps_text(it), {"small": small})) == progress(it)
+
+
+def test_empty_flow():
+    it = Sequential({}, [])
+    restored = loads(dumps(it), {})
+    assert not restored.has_flow()
+
+
+def test_empty_flow_with_intents_to_topics():
+    with pytest.raises(StaleFlowState):
+        loads(dumps(Sequential({}, [])), {}, {"explicame": "topic_0"})
+
+
+def test_stale_fingerprint(small):
+    data = dumps(advanced(Sequential, small, 2))
+    changed = CompiledFlow.from_raw("small", raw_topics(3, 3))
+    with pytest.raises(StaleFlowState):
+        loads(data, {"small": changed})
+
+
+def test_unknown_flow(small):
+    with pytest.raises(ValueError):
+        loads(dumps(advanced(Sequential, small, 2)), {})
+
+
+@pytest.mark.parametrize("flow_name", ["small", "large"])
+def test_truncated(flow_name, small, large):
+    flows = {"small": small, "large": large}
+    data = dumps(advanced(Sequential, flows[flow_name], 4))
+    for length in range(len(data)):
+        with pytest.raises(ValueError):
+            loads(data[:length], flows)
+
+
+def test_long_flow_name():
+    flow = CompiledFlow.from_raw("flujo_" * 60, raw_topics(2, 1))
+    it = advanced(Sequential, flow, 1)
+    assert progress(loads(dumps(it), {flow.name: flow})) == progress(it)
+    too_long = CompiledFlow.from_raw("x" * 70000, raw_topics(1, 0))
+    with pytest.raises(ValueError):
+        dumps(Sequential({}, too_long.instantiate()))
+
+
+@pytest.mark.parametrize("length", [0xFFFF, 0x10000])
+def test_long_current_topic(length, small):
+    it = advanced(Sequential, small, 1)
+    it.set_current_topic("t" * length)
+    with pytest.raises(ValueError):
+        dumps(it)
+    it.set_current_topic("t" * (length - 2))
+    assert loads(dumps(it), {"small": small}).get_current_topic() == "t" * (length - 2)
@@ -0,0 +1,23 @@
+import pytest
+
+from tour.flows.compiled import CompiledFlow
+from tour.topic.topics import MAX_CURSOR, Topic
+
+
+def test_set_current_example():
+    topic = Topic.from_dict({"topic_id": "capas", "type": "simple", "utters": ["utter_capas"],
+                             "examples": ["utter_capas_ejemplo"]})
+    topic.set_current_example(MAX_CURSOR)
+    assert topic.get_current_example() == MAX_CURSOR
+    assert topic.get_example() == "utter_sin_ejemplos"
+    assert topic.get_current_example() == 0
+    for example in (-1, MAX_CURSOR + 1):
+        with pytest.raises(ValueError):
+            topic.set_current_example(example)
+    assert topic.get_current_example() == 0
+
+
+def test_too_many_examples():
+    with pytest.raises(ValueError):
+        CompiledFlow.from_raw("capas", [{"topic_id": "capas", "type": "simple", "utters": ["utter_capas"],
+                                         "examples": ["utter_capas_ejemplo"] * (MAX_CURSOR + 1)}])
@@ -1,9 +1,10 @@
 import itertools
-import json
-from typing import Optional, List
-import requests
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, List, Tuple
 
-NLU_URL = "http://localhost:5001/model/parse"
+from tour.arch_search import MIN_COMBINATION_SIZE, ExhaustiveSearch, SearchResult, SearchStrategy
+from tour.nlu.scorer import NLU_URL, HttpScorer, Scorer
 
 
 class architecture:
@@ -18,44 +19,228 @@ class architecture:
         return self.requirements
 
 
+def _rank(ids: Tuple[int, ...], response: Dict[str, Any]) -> Tuple:
+    # Highest confidence, then bigger combination, then the first one in enumeration order:
+    # the same winner the exhaustive search picks.
+    return response["intent"]["confidence"], len(ids), tuple(-i for i in ids)
+
+
 class architecture_finder:
-    def __init__(self, requirements=None):
+    def __init__(self, requirements=None, scorer: Optional[Scorer] = None, search: Optional[SearchStrategy] = None,
+                 incremental: bool = False):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+
+        requirements
+            Initial requirements of the user.
+        scorer
+            Scorer used to classify the combinations, one request per combination by default.
+        search
+            Strategy used to explore the combinations, exhaustive by default.
+        incremental
+            Keeps the scored combinations between searches and only scores the combinations that contain
+            requirements added since the last search. It gives the exhaustive search winner and ignores search.
+        """
         self.found_architectures = {}
         self.user_requirements = requirements if requirements else []
+        self.scorer = scorer if scorer else HttpScorer(NLU_URL)
+        self.search = search if search else ExhaustiveSearch()
+        self.incremental = incremental
+        self.stats = {"searches": 0, "combinations": 0, "round_trips": 0, "round_trips_saved": 0}
+        # Requirement ids only grow, so ordering combinations by ids is ordering them by position.
+        self._requirement_ids = list(range(len(self.user_requirements)))
+        self._next_requirement_id = len(self.user_requirements)
+        self._scored_through = 0
+        self._scored = {}
+        self._best = None
 
     def add_requirement(self, requirement: str):
         self.user_requirements.append(requirement)
+        self._requirement_ids.append(self._next_requirement_id)
+        self._next_requirement_id += 1
 
     def find_architecture(self) -> Optional[str]:
-        found_arch_name = ""
-        found_arch_reqs = []
-        arch_confidence = 0
-        if len(self.user_requirements) > 2:
-            for r in range(3, len(self.user_requirements) + 1):
-                for reqs_combination in list(itertools.combinations(self.user_requirements, r)):
-                    text = ""
-                    for req in reqs_combination:
-                        text += req + ", "
-                    response = requests.post(NLU_URL, data=json.dumps({"text": text})).json()
-                    if response["intent"]["confidence"] > arch_confidence or \
-                            (response["intent"]["confidence"] == arch_confidence and
-                             len(found_arch_reqs) < len(reqs_combination)):
-                        found_arch_name = response["intent"]["name"]
-                        found_arch_reqs = reqs_combination
-                        arch_confidence = response["intent"]["confidence"]
-
-        else:
+        if len(self.user_requirements) < 3:
             return None
-        self.found_architectures[len(self.found_architectures.keys()) + 1] = {"name": found_arch_name,
-                                                                              "requirements": list(found_arch_reqs)}
-        for req in found_arch_reqs:
-            self.user_requirements.remove(req)
-        return found_arch_name
+        round_trips = self.scorer.round_trips
+        if self.incremental:
+            found = self._search_new_combinations()
+        else:
+            found = self.search.search(self.user_requirements, self.scorer)
+        self._record_search(found.evaluations, self.scorer.round_trips - round_trips)
+        self.found_architectures[len(self.found_architectures.keys()) + 1] = {"name": found.name,
+                                                                              "requirements": list(found.requirements)}
+        if self.incremental:
+            self._remove_requirements(self._best[0])
+        else:
+            for req in found.requirements:
+                self._remove_requirements((self._requirement_ids[self.user_requirements.index(req)],))
+        return found.name
+
+    def _search_new_combinations(self) -> SearchResult:
+        """
+        Scores the combinations with at least one requirement added after the previous search and
+        updates the running best.
+        """
+        positions = [p for p, requirement_id in enumerate(self._requirement_ids)
+                     if requirement_id >= self._scored_through]
+        pending = []
+        for position in positions:
+            # Combinations whose last requirement is the new one.
+            for r in range(MIN_COMBINATION_SIZE - 1, position + 1):
+                pending.extend(combination + (position,) for combination in itertools.combinations(range(position), r))
+        responses = self.scorer.score([tuple(self.user_requirements[p] for p in combination)
+                                       for combination in pending])
+        for combination, response in zip(pending, responses):
+            ids = tuple(self._requirement_ids[p] for p in combination)
+            self._scored[ids] = response
+            if self._best is None or _rank(ids, response) > _rank(*self._best):
+                self._best = (ids, response)
+        self._scored_through = self._next_requirement_id
+        positions_by_id = {requirement_id: p for p, requirement_id in enumerate(self._requirement_ids)}
+        ids, response = self._best
+        return SearchResult(response["intent"]["name"],
+                            tuple(self.user_requirements[positions_by_id[i]] for i in ids),
+                            response["intent"]["confidence"],
+                            len(pending))
+
+    def _remove_requirements(self, ids: Tuple[int, ...]):
+        """
+        Removes requirements, and the scored combinations that contained them.
+        """
+        removed = set(ids)
+        kept = [p for p, requirement_id in enumerate(self._requirement_ids) if requirement_id not in removed]
+        self.user_requirements[:] = [self.user_requirements[p] for p in kept]
+        self._requirement_ids = [self._requirement_ids[p] for p in kept]
+        if self._scored:
+            self._scored = {key: response for key, response in self._scored.items() if removed.isdisjoint(key)}
+            self._best = max(self._scored.items(), key=lambda item: _rank(*item)) if self._scored else None
+
+    def _record_search(self, combinations: int, round_trips: int):
+        """
+        Updates the search counters. A search that sends one request per combination saves no round trips.
+        """
+        self.stats["searches"] += 1
+        self.stats["combinations"] += combinations
+        self.stats["round_trips"] += round_trips
+        self.stats["round_trips_saved"] += combinations - round_trips
 
     def clear_requirements(self):
         self.user_requirements.clear()
         self.found_architectures.clear()
+        self._requirement_ids.clear()
+        self._scored.clear()
+        self._best = None
 
     def get_last_architecture(self) -> Optional[str]:
         return self.found_architectures[len(self.found_architectures.keys())]["name"] if len(self.found_architectures.keys()) > 0 else None
 
+
+
+class FinderSessions:
+    """
+    Architecture finder of each conversation, keyed by sender id, so the requirements of one
+    user are never scored together with the ones of another.
+
+    Sessions idle for longer than idle_timeout are dropped, and when there are more than
+    max_sessions the least recently used one is dropped.
+    """
+    def __init__(self, factory: Callable[[], architecture_finder] = architecture_finder,
+                 idle_timeout: Optional[float] = 1800.0, max_sessions: int = 1000):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+
+        factory
+            Creates the finder of a new conversation.
+        idle_timeout
+            Seconds without turns after which a conversation loses its requirements, None to never expire them.
+        max_sessions
+            Maximum amount of conversations kept.
+        """
+        self._factory = factory
+        self._idle_timeout = idle_timeout
+        self._max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self.evictions = 0
+
+    def get(self, sender_id: str) -> architecture_finder:
+        """
+        Get the finder of a conversation, creating it if needed.
+
+        Parameters
+        ----------
+
+        sender_id
+            Rasa sender id of the conversation.
+        """
+        now = time.monotonic()
+        self._evict_idle(now)
+        entry = self._sessions.pop(sender_id, None)
+        finder = entry[1] if entry is not None else self._factory()
+        self._sessions[sender_id] = (now, finder)
+        while len(self._sessions) > self._max_sessions:
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+        return finder
+
+    def discard(self, sender_id: str):
+        self._sessions.pop(sender_id, None)
+
+    def _evict_idle(self, now: float):
+        # Sessions are kept from least to most recently used, so only the expired ones are visited.
+        while self._idle_timeout is not None and self._sessions:
+            sender_id, (last_used, _) = next(iter(self._sessions.items()))
+            if now - last_used <= self._idle_timeout:
+                break
+            del self._sessions[sender_id]
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+def compare_finders(conversations: List[List[str]], reference: Callable[[], architecture_finder],
+                    candidate: Callable[[], architecture_finder]) -> Dict[str, Any]:
+    """
+    Replays recorded conversations on two kinds of finder, adding one requirement and searching
+    on every turn like NodeRequirement does, and measures how often they agree.
+
+    Parameters
+    ----------
+
+    conversations
+        Requirements given on each turn of each conversation.
+    reference
+        Creates the finder taken as ground truth, usually the exhaustive one.
+    candidate
+        Creates the finder to evaluate.
+
+    Returns
+    -------
+
+    Dictionary with the amount of turns, the turns where both found the same architecture (and the
+    same requirements), and the round trips and seconds spent by each finder.
+    """
+    report = {"turns": 0, "same_architecture": 0, "same_requirements": 0,
+              "reference": {"round_trips": 0, "seconds": 0.0}, "candidate": {"round_trips": 0, "seconds": 0.0}}
+    for requirements in conversations:
+        finders = {"reference": reference(), "candidate": candidate()}
+        for requirement in requirements:
+            found = {}
+            for key, finder in finders.items():
+                round_trips = finder.scorer.round_trips
+                start = time.perf_counter()
+                finder.add_requirement(requirement)
+                found[key] = (finder.find_architecture(), list(finder.user_requirements))
+                report[key]["seconds"] += time.perf_counter() - start
+                report[key]["round_trips"] += finder.scorer.round_trips - round_trips
+            report["turns"] += 1
+            report["same_architecture"] += found["reference"][0] == found["candidate"][0]
+            report["same_requirements"] += found["reference"] == found["candidate"]
+    return report
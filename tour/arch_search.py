@@ -0,0 +1,182 @@
+import abc
+import itertools
+import random
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from tour.nlu.scorer import Scorer
+
+MIN_COMBINATION_SIZE = 3
+
+
+class SearchResult:
+    """
+    Architecture chosen by a search.
+    """
+    def __init__(self, name: str, requirements: Tuple[str, ...], confidence: float, evaluations: int):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+
+        name
+            Intent (architecture) of the winning combination, "" if nothing was evaluated.
+        requirements
+            Requirements of the winning combination.
+        confidence
+            NLU confidence of the winning combination.
+        evaluations
+            Amount of combinations classified during the search.
+        """
+        self.name = name
+        self.requirements = requirements
+        self.confidence = confidence
+        self.evaluations = evaluations
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "requirements": list(self.requirements),
+                "confidence": self.confidence, "evaluations": self.evaluations}
+
+
+def best_combination(scored: Iterable[Tuple[Sequence[str], Dict[str, Any]]], evaluations: int) -> SearchResult:
+    """
+    Picks the winner among scored combinations.
+
+    The combinations have to come in the exhaustive enumeration order (by size, then by position of the
+    requirements), so ties are broken as they always were: highest confidence first, then the bigger
+    combination, then the first one found.
+
+    Parameters
+    ----------
+
+    scored
+        Pairs of combination and parse result.
+    evaluations
+        Amount of combinations classified to get the pairs.
+    """
+    found_arch_name = ""
+    found_arch_reqs = ()
+    arch_confidence = 0
+    for reqs_combination, response in scored:
+        if response["intent"]["confidence"] > arch_confidence or \
+                (response["intent"]["confidence"] == arch_confidence and
+                 len(found_arch_reqs) < len(reqs_combination)):
+            found_arch_name = response["intent"]["name"]
+            found_arch_reqs = tuple(reqs_combination)
+            arch_confidence = response["intent"]["confidence"]
+    return SearchResult(found_arch_name, found_arch_reqs, arch_confidence, evaluations)
+
+
+class SearchStrategy(metaclass=abc.ABCMeta):
+    """
+    Strategy to explore the combinations of the user requirements.
+    """
+    @abc.abstractmethod
+    def search(self, requirements: List[str], scorer: Scorer) -> SearchResult:
+        """
+        Looks for the combination of requirements (of 3 or more) that best describes an architecture.
+
+        Parameters
+        ----------
+
+        requirements
+            Requirements given by the user, at least 3.
+        scorer
+            Scorer used to classify the combinations.
+        """
+        raise NotImplementedError
+
+
+class ExhaustiveSearch(SearchStrategy):
+    """
+    Classifies every combination of 3 or more requirements. The work grows as 2^N.
+    """
+    def search(self, requirements: List[str], scorer: Scorer) -> SearchResult:
+        combinations = []
+        for r in range(MIN_COMBINATION_SIZE, len(requirements) + 1):
+            combinations.extend(itertools.combinations(requirements, r))
+        responses = scorer.score(combinations)
+        return best_combination(zip(combinations, responses), len(combinations))
+
+
+class BeamSearch(SearchStrategy):
+    """
+    Grows the best combinations one requirement at a time, starting from the triples.
+
+    Each level keeps the beam_width most confident combinations and classifies every combination
+    that adds one more requirement to them. The search stops when the evaluation budget is spent,
+    when a combination reaches the confidence threshold or when all the requirements are used.
+    """
+    def __init__(self, beam_width: int = 5, budget: int = 200, confidence_threshold: Optional[float] = None,
+                 seed: int = 0):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+
+        beam_width
+            Amount of combinations expanded on each level.
+        budget
+            Maximum amount of combinations classified per search.
+        confidence_threshold
+            Confidence that is good enough to stop searching, None to never stop early.
+        seed
+            Seed used to sample the triples when there are more of them than half the budget.
+        """
+        self._beam_width = beam_width
+        self._budget = budget
+        self._confidence_threshold = confidence_threshold
+        self._seed = seed
+
+    def search(self, requirements: List[str], scorer: Scorer) -> SearchResult:
+        scored = {}
+
+        def evaluate(candidates: List[Tuple[int, ...]]) -> List[Tuple[int, ...]]:
+            candidates = [c for c in candidates if c not in scored][:self._budget - len(scored)]
+            if candidates:
+                responses = scorer.score([tuple(requirements[i] for i in c) for c in candidates])
+                scored.update(zip(candidates, responses))
+            return candidates
+
+        def result() -> SearchResult:
+            ordered = sorted(scored.items(), key=lambda item: (len(item[0]), item[0]))
+            return best_combination(((tuple(requirements[i] for i in c), response) for c, response in ordered),
+                                    len(scored))
+
+        indexes = range(len(requirements))
+        triples = list(itertools.combinations(indexes, MIN_COMBINATION_SIZE))
+        if len(triples) > self._budget:
+            triples = sorted(random.Random(self._seed).sample(triples, max(self._budget // 2, 1)))
+        level = evaluate(triples)
+        while level and len(scored) < self._budget:
+            if self._confidence_threshold is not None and \
+                    result().confidence >= self._confidence_threshold:
+                break
+            beam = sorted(level, key=lambda c: (-scored[c]["intent"]["confidence"], c))[:self._beam_width]
+            level = evaluate(sorted({tuple(sorted(c + (i,))) for c in beam for i in indexes if i not in c}))
+        return result()
+
+
+def compare_with_exhaustive(requirements: List[str], scorer: Scorer, strategy: SearchStrategy) -> Dict[str, Any]:
+    """
+    Runs a strategy and the exhaustive search over the same requirements, to measure the
+    quality/latency trade-off of the strategy.
+
+    Returns
+    -------
+
+    Dictionary with the result, round trips and seconds of each search, and whether both found
+    the same architecture with the same requirements.
+    """
+    report = {}
+    for key, search in (("exhaustive", ExhaustiveSearch()), ("strategy", strategy)):
+        round_trips = scorer.round_trips
+        start = time.perf_counter()
+        found = search.search(requirements, scorer)
+        report[key] = dict(found.as_dict(), round_trips=scorer.round_trips - round_trips,
+                           seconds=time.perf_counter() - start)
+    report["same_architecture"] = report["exhaustive"]["name"] == report["strategy"]["name"]
+    report["same_requirements"] = report["exhaustive"]["requirements"] == report["strategy"]["requirements"]
+    return report
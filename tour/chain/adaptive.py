@@ -0,0 +1,144 @@
+"""
+Chain of responsibility that checks its most selected nodes first.
+
+Two nodes overlap when some turn can check both of their criteria. The chain must keep the order
+of the nodes that overlap, since for those turns the first one wins, but nodes that never overlap
+can be checked in any order without changing the selected node. AdaptiveChain counts how often
+each node is selected and, every reorder_every turns, puts the most selected nodes first among the
+orders that keep every overlapping pair as it was.
+"""
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from rasa.shared.core.trackers import DialogueStateTracker
+
+from tour.chain.context import TurnContext
+from tour.chain.dispatch import assignments
+from tour.chain.node import Node
+from tour.chain.recent_events import RecentEvents
+from tour.conversation_flow.conversation_flow import ConversationFlow
+
+logger = logging.getLogger(__name__)
+
+# Pairs of criteria with more assignments are taken as overlapping without checking them.
+MAX_PAIR_ASSIGNMENTS = 1 << 16
+
+
+def overlap(first: Node, second: Node) -> bool:
+    """
+    Checks if a turn can check the criteria of both nodes. The end of the chain overlaps every node.
+    """
+    if first.get_successor() is None or second.get_successor() is None:
+        return True
+    criteria = (first.get_criterion(), second.get_criterion())
+    truths = assignments([atom for criterion in criteria for atom in criterion.atoms()], MAX_PAIR_ASSIGNMENTS)
+    if truths is None:
+        return True
+    return any(criteria[0].evaluate(truth) and criteria[1].evaluate(truth) for truth in truths)
+
+
+class AdaptiveChain:
+    """
+    Selects the same node as the chain it is built from, checking the most selected nodes first.
+    """
+    def __init__(self, chain: Node, reorder_every: int = 1000, decay: float = 0.5):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+
+        chain
+            First node of the chain.
+        reorder_every
+            Turns between reorders.
+        decay
+            Weight kept by the hits before a reorder, so the order follows changes in the traffic.
+        """
+        self._chain = chain
+        self._nodes = list(chain.chain())
+        n = len(self._nodes)
+        # Nodes that must be checked before each node.
+        self._before = [[i for i in range(j) if overlap(self._nodes[i], self._nodes[j])] for j in range(n)]
+        self._order: Tuple[int, ...] = tuple(range(n))
+        self._hits = [0] * n
+        self._total_hits = [0] * n
+        self._weights = [0.0] * n
+        self._reorder_every = reorder_every
+        self._decay = decay
+        self._turns = 0
+        self.reorders = 0
+        self._lock = threading.Lock()
+
+    def select(self, context: TurnContext) -> Node:
+        """
+        Same as Node.select over the chain.
+        """
+        nodes = self._nodes
+        for i in self._order:
+            node = nodes[i]
+            if node.get_successor() is None or node.get_criterion().check(context):
+                break
+        self._hits[i] += 1
+        self._total_hits[i] += 1
+        self._turns += 1
+        if self._turns % self._reorder_every == 0:
+            self.reorder()
+        return node
+
+    def next(self, it: ConversationFlow, tracker: DialogueStateTracker,
+             recent_events: Optional[RecentEvents] = None) -> str:
+        """
+        Same as Node.next over the chain.
+        """
+        context = TurnContext(it, tracker, recent_events)
+        return self.select(context).handle(context)
+
+    def reorder(self) -> Tuple[int, ...]:
+        """
+        Puts the most selected nodes first, keeping the order of the nodes that overlap.
+
+        Returns
+        -------
+
+        Positions in the chain of the nodes in the order they are checked.
+        """
+        with self._lock:
+            for i, hits in enumerate(self._hits):
+                self._weights[i] = self._weights[i] * self._decay + hits
+            self._hits = [0] * len(self._nodes)
+            order, placed = [], set()
+            while len(order) < len(self._nodes):
+                ready = [j for j in range(len(self._nodes))
+                         if j not in placed and all(i in placed for i in self._before[j])]
+                # Among the nodes that can go next, the hottest one, ties kept in the chain order.
+                j = max(ready, key=lambda j: (self._weights[j], -j))
+                order.append(j)
+                placed.add(j)
+            if tuple(order) != self._order:
+                logger.debug("Chain reordered to %s", [type(self._nodes[j]).__name__ for j in order])
+            self._order = tuple(order)
+            self.reorders += 1
+            return self._order
+
+    def get_chain(self) -> Node:
+        return self._chain
+
+    def get_order(self) -> List[Node]:
+        return [self._nodes[i] for i in self._order]
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """
+        Get, for each node in the chain order, its position in the current order, the nodes that must
+        be checked before it, its weight at the last reorder, the hits since then and all its hits.
+        """
+        position = {j: k for k, j in enumerate(self._order)}
+        return [{"node": type(node).__name__,
+                 "chain_position": j,
+                 "position": position[j],
+                 "after": [type(self._nodes[i]).__name__ for i in self._before[j]],
+                 "weight": self._weights[j],
+                 "hits": self._hits[j],
+                 "total_hits": self._total_hits[j]}
+                for j, node in enumerate(self._nodes)]
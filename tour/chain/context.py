@@ -0,0 +1,81 @@
+from typing import Any, Callable, Optional
+
+from rasa.shared.core.trackers import DialogueStateTracker
+
+from tour.chain.recent_events import RecentEvents
+from tour.conversation_flow.conversation_flow import ConversationFlow
+
+
+class _memoized:
+    """
+    Same as functools.cached_property, without the lock it takes on every first read before
+    Python 3.12. A context is only used by the thread of its turn.
+    """
+    def __init__(self, read: Callable[[Any], Any]) -> None:
+        self._read = read
+        self._name = read.__name__
+        self.__doc__ = read.__doc__
+
+    def __get__(self, context: Any, owner: type = None) -> Any:
+        if context is None:
+            return self
+        value = context.__dict__[self._name] = self._read(context)
+        return value
+
+
+class TurnContext:
+    """
+    What the nodes and criteria of the chain read from a turn. Each value is read from the tracker
+    the first time it is needed and kept for the rest of the turn, so it is read once however many
+    criteria compare it.
+    """
+    def __init__(self, it: ConversationFlow, tracker: DialogueStateTracker,
+                 recent_events: Optional[RecentEvents] = None) -> None:
+        """
+        Constructor.
+
+        Parameters
+        ----------
+
+        it
+            Conversation flow of the user.
+        tracker
+            Rasa tracker.
+        recent_events
+            Last events of the conversation, already up to date with the tracker.
+        """
+        self.it = it
+        self.tracker = tracker
+        self._recent_events = recent_events
+
+    @_memoized
+    def action(self) -> Optional[str]:
+        return self.tracker.latest_action_name
+
+    @_memoized
+    def intent(self) -> Optional[str]:
+        return self.tracker.latest_message.intent['name']
+
+    @_memoized
+    def entity(self) -> Any:
+        """
+        Latest value of the "tema" entity, None if there is none.
+        """
+        return next(self.tracker.get_latest_entity_values("tema"), None)
+
+    @_memoized
+    def message(self) -> Optional[str]:
+        return self.tracker.latest_message.text
+
+    @_memoized
+    def empty_flow(self) -> bool:
+        return not self.it.has_flow()
+
+    @_memoized
+    def recent_events(self) -> RecentEvents:
+        """
+        Last events of the conversation, the ones kept by the policy if it passed them.
+        """
+        if self._recent_events is not None:
+            return self._recent_events
+        return RecentEvents.from_events(self.tracker.events)
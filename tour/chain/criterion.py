@@ -1,26 +1,68 @@
 import abc
-from rasa.shared.core.trackers import DialogueStateTracker
-from tour.conversation_flow.conversation_flow import ConversationFlow
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+from tour.chain.context import TurnContext
 
 
 class Criterion(metaclass=abc.ABCMeta):
 
     @abc.abstractmethod
-    def check(self, it: ConversationFlow, tracker: DialogueStateTracker) -> bool:
+    def check(self, context: TurnContext) -> bool:
         raise NotImplementedError
 
+    def feature(self) -> Optional[Tuple[str, Any]]:
+        """
+        Attribute of the TurnContext and the value the criterion compares it with.
+
+        Returns
+        -------
+
+        None if the criterion is not an equality check over a single feature.
+        """
+        return None
+
+    def atoms(self) -> Iterator["Criterion"]:
+        """
+        Criteria without sub criteria this one is made of.
+        """
+        yield self
+
+    def evaluate(self, truth: Callable[["Criterion"], bool]) -> bool:
+        """
+        Result of the criterion given the result of each of its atoms.
+
+        Parameters
+        ----------
+
+        truth
+            Result of an atom.
+        """
+        return truth(self)
+
+    def wrap(self, wrapper: Callable[["Criterion"], "Criterion"]) -> "Criterion":
+        """
+        Copy of the criterion with the wrapper applied to it and to each of its sub criteria.
+        """
+        return wrapper(self)
+
 class EmptyFlow(Criterion):
 
-    def check(self, it: ConversationFlow, tracker: DialogueStateTracker) -> bool:
-        return not it.has_flow()
+    def check(self, context: TurnContext) -> bool:
+        return context.empty_flow
+
+    def feature(self) -> Optional[Tuple[str, Any]]:
+        return "empty_flow", True
 
 class EqualMessage(Criterion):
 
     def __init__(self, compare: str) -> None:
         self._compare = compare
     
-    def check(self, it: ConversationFlow, tracker: DialogueStateTracker) -> bool:
-        return self._compare == tracker.latest_message.text
+    def check(self, context: TurnContext) -> bool:
+        return self._compare == context.message
+
+    def feature(self) -> Optional[Tuple[str, Any]]:
+        return "message", self._compare
 
 class EqualIntent(Criterion):
     """
@@ -42,7 +84,7 @@ class EqualIntent(Criterion):
         """
         self._compare = compare
 
-    def check(self, it: ConversationFlow, tracker: DialogueStateTracker) -> bool:
+    def check(self, context: TurnContext) -> bool:
         """
         Checks if the latest intent is equal to the string given in the constructor
 
@@ -51,15 +93,18 @@ class EqualIntent(Criterion):
         Parameters
         ----------
 
-        tracker
-            Rasa tracker.
+        context
+            Values of the turn.
 
         Returns
         -------
 
         Returns true or false if the latest intent is equal to the str given by parameter or not.
         """
-        return self._compare == tracker.latest_message.intent['name']
+        return self._compare == context.intent
+
+    def feature(self) -> Optional[Tuple[str, Any]]:
+        return "intent", self._compare
 
 
 class EqualAction(Criterion):
@@ -82,7 +127,7 @@ class EqualAction(Criterion):
         """
         self._compare = compare
 
-    def check(self, it: ConversationFlow, tracker: DialogueStateTracker) -> bool:
+    def check(self, context: TurnContext) -> bool:
         """
         Checks if the latest action is equal to the string given in the constructor
 
@@ -91,15 +136,18 @@ class EqualAction(Criterion):
         Parameters
         ----------
 
-        tracker
-            Rasa tracker.
+        context
+            Values of the turn.
 
         Returns
         -------
 
         Returns true or false if the latest action is equal to the str given by parameter or not.
         """
-        return self._compare == tracker.latest_action_name
+        return self._compare == context.action
+
+    def feature(self) -> Optional[Tuple[str, Any]]:
+        return "action", self._compare
 
 
 class EqualEntity(Criterion):
@@ -122,7 +170,7 @@ class EqualEntity(Criterion):
         """
         self._compare = compare
 
-    def check(self, it: ConversationFlow, tracker: DialogueStateTracker) -> bool:
+    def check(self, context: TurnContext) -> bool:
         """
         Checks if the latest entity with "tema" as name is equal to the string given in the constructor
 
@@ -131,20 +179,23 @@ class EqualEntity(Criterion):
         Parameters
         ----------
 
-        tracker
-            Rasa tracker.
+        context
+            Values of the turn.
 
         Returns
         -------
 
         Returns true or false if the latest entity with "tema" as name is equal to the str given by parameter or not.
         """
-        return self._compare == next(tracker.get_latest_entity_values("tema"), None)
+        return self._compare == context.entity
+
+    def feature(self) -> Optional[Tuple[str, Any]]:
+        return "entity", self._compare
 
 
 class EqualPenultimateIntent(Criterion):
     """
-    Checks if the penultimate event in the tracker is equal to a String
+    Checks if the penultimate event in the tracker is about an action, intent or response
 
     Author: Tomas
     """
@@ -162,7 +213,7 @@ class EqualPenultimateIntent(Criterion):
         """
         self._compare = compare
 
-    def check(self, it: ConversationFlow, tracker: DialogueStateTracker) -> bool:
+    def check(self, context: TurnContext) -> bool:
         """
         Checks if the penultimate event in the tracker is equal to attribute compare set in constructor.
 
@@ -171,19 +222,16 @@ class EqualPenultimateIntent(Criterion):
         Parameters
         ----------
 
-        tracker
-            Rasa tracker.
+        context
+            Values of the turn.
 
         Returns
         -------
 
-        Returns true if the penultimate event is equal to the string set in constructor, else returns false.
+        Returns true if the penultimate event is about the action, intent or response set in constructor, else returns false.
         """
-        if len(tracker.as_dialogue().events) > 5:
-            penultimate_intent = str(tracker.as_dialogue().events[-4])
-        else:
-            penultimate_intent = None
-        if penultimate_intent is not None and penultimate_intent.find(self._compare) != -1:
+        penultimate_intent = context.recent_events.get(-4) if len(context.recent_events) > 5 else None
+        if penultimate_intent is not None and penultimate_intent.name == self._compare:
             return True
         else:
             return False
@@ -212,7 +260,7 @@ class AndCriterion(Criterion):
         self._criterion1 = criterion1
         self._criterion2 = criterion2
 
-    def check(self, it: ConversationFlow, tracker: DialogueStateTracker) -> bool:
+    def check(self, context: TurnContext) -> bool:
         """
         Checks if the AND operation is true or false
 
@@ -221,15 +269,25 @@ class AndCriterion(Criterion):
         Parameters
         ----------
 
-        tracker
-            Rasa tracker.
+        context
+            Values of the turn.
 
         Returns
         -------
 
         Returns true if the AND operation is true, else is false.
         """
-        return self._criterion1.check(it,tracker) and self._criterion2.check(it,tracker)
+        return self._criterion1.check(context) and self._criterion2.check(context)
+
+    def atoms(self) -> Iterator[Criterion]:
+        yield from self._criterion1.atoms()
+        yield from self._criterion2.atoms()
+
+    def evaluate(self, truth: Callable[[Criterion], bool]) -> bool:
+        return self._criterion1.evaluate(truth) and self._criterion2.evaluate(truth)
+
+    def wrap(self, wrapper: Callable[[Criterion], Criterion]) -> Criterion:
+        return wrapper(AndCriterion(self._criterion1.wrap(wrapper), self._criterion2.wrap(wrapper)))
 
 
 class NotCriterion(Criterion):
@@ -252,7 +310,7 @@ class NotCriterion(Criterion):
         """
         self._criterion1 = criterion1
 
-    def check(self, it: ConversationFlow, tracker: DialogueStateTracker) -> bool:
+    def check(self, context: TurnContext) -> bool:
         """
         Checks if the NOT operation is true or false
 
@@ -261,15 +319,24 @@ class NotCriterion(Criterion):
         Parameters
         ----------
 
-        tracker
-            Rasa tracker.
+        context
+            Values of the turn.
 
         Returns
         -------
 
         Returns true if the NOT operation is true, else is false.
         """
-        return not self._criterion1.check(it,tracker)
+        return not self._criterion1.check(context)
+
+    def atoms(self) -> Iterator[Criterion]:
+        return self._criterion1.atoms()
+
+    def evaluate(self, truth: Callable[[Criterion], bool]) -> bool:
+        return not self._criterion1.evaluate(truth)
+
+    def wrap(self, wrapper: Callable[[Criterion], Criterion]) -> Criterion:
+        return wrapper(NotCriterion(self._criterion1.wrap(wrapper)))
 
 
 class OrCriterion(Criterion):
@@ -295,7 +362,7 @@ class OrCriterion(Criterion):
         self._criterion1 = criterion1
         self._criterion2 = criterion2
 
-    def check(self, it: ConversationFlow, tracker: DialogueStateTracker) -> bool:
+    def check(self, context: TurnContext) -> bool:
         """
         Checks if the OR operation is true or false
 
@@ -304,12 +371,22 @@ class OrCriterion(Criterion):
         Parameters
         ----------
 
-        tracker
-            Rasa tracker.
+        context
+            Values of the turn.
 
         Returns
         -------
 
         Returns true if the OR operation is true, else is false.
         """
-        return self._criterion1.check(it,tracker) or self._criterion2.check(it,tracker)
+        return self._criterion1.check(context) or self._criterion2.check(context)
+
+    def atoms(self) -> Iterator[Criterion]:
+        yield from self._criterion1.atoms()
+        yield from self._criterion2.atoms()
+
+    def evaluate(self, truth: Callable[[Criterion], bool]) -> bool:
+        return self._criterion1.evaluate(truth) or self._criterion2.evaluate(truth)
+
+    def wrap(self, wrapper: Callable[[Criterion], Criterion]) -> Criterion:
+        return wrapper(OrCriterion(self._criterion1.wrap(wrapper), self._criterion2.wrap(wrapper)))
@@ -0,0 +1,193 @@
+"""
+Decision table for a chain of responsibility.
+
+Most criteria of the chain compare a single feature of the turn with a constant, so the node a turn
+goes to only depends on which of those constants each feature is equal to. Dispatcher reads every
+feature once, codes it as the position of its constant (or one past the last constant when it is
+equal to none of them) and looks the node up in a table built from the chain, instead of checking
+the criteria of the nodes one by one. The criteria that are not such comparisons, like
+EqualPenultimateIntent, are only checked for the turns whose node depends on them.
+"""
+import itertools
+from operator import attrgetter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from rasa.shared.core.trackers import DialogueStateTracker
+
+from tour.chain.context import TurnContext
+from tour.chain.criterion import Criterion
+from tour.chain.node import Node
+from tour.chain.recent_events import RecentEvents
+from tour.conversation_flow.conversation_flow import ConversationFlow
+
+# Attributes of the TurnContext that can be coded.
+FEATURES = ("action", "intent", "entity", "empty_flow", "message")
+# Larger tables are not worth building, the chain is left as it is.
+MAX_ENTRIES = 1 << 20
+
+
+def _code(codes: Dict[Any, int], other: int, value: Any) -> int:
+    try:
+        return codes.get(value, other)
+    except TypeError:
+        # Unhashable values are not equal to any of the constants.
+        return other
+
+
+def assignments(atoms: Iterable[Criterion], max_assignments: int = MAX_ENTRIES) -> Optional[Iterator[Callable[[Criterion], bool]]]:
+    """
+    Every way the atoms can be true or false together. Atoms comparing the same feature with
+    different constants are never true together, the other atoms can take any result.
+
+    Returns
+    -------
+
+    Result of each atom for every assignment, None if there are more than max_assignments.
+    """
+    constants: Dict[Tuple[str, Any], int] = {}
+    sizes: Dict[str, int] = {}
+    opaque: List[int] = []
+    for atom in atoms:
+        feature = atom.feature()
+        if feature is None or feature[0] not in FEATURES:
+            if id(atom) not in opaque:
+                opaque.append(id(atom))
+        elif feature not in constants:
+            constants[feature] = sizes.get(feature[0], 0)
+            sizes[feature[0]] = constants[feature] + 1
+    count = 2 ** len(opaque)
+    for size in sizes.values():
+        count *= size + 1
+    if count > max_assignments:
+        return None
+
+    def generate() -> Iterator[Callable[[Criterion], bool]]:
+        for key in itertools.product(*(range(size + 1) for size in sizes.values())):
+            codes = dict(zip(sizes, key))
+            for outcome in itertools.product((False, True), repeat=len(opaque)):
+                outcomes = dict(zip(opaque, outcome))
+
+                def truth(atom: Criterion, codes=codes, outcomes=outcomes) -> bool:
+                    if id(atom) in outcomes:
+                        return outcomes[id(atom)]
+                    return codes[atom.feature()[0]] == constants[atom.feature()]
+                yield truth
+    return generate()
+
+
+class Dispatcher:
+    """
+    Selects the same node as the chain it is built from, with one lookup per turn.
+    """
+    def __init__(self, chain: Node):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+
+        chain
+            First node of the chain.
+
+        Raises
+        ------
+
+        ValueError
+            If a criterion compares a feature missing in FEATURES or the table would have more
+            than MAX_ENTRIES entries.
+        """
+        self._chain = chain
+        self._nodes = list(chain.chain())
+        self._constants: Dict[str, Dict[Any, int]] = {}
+        self._opaque: List[Criterion] = []
+        for node in self._nodes:
+            if node.get_successor() is None:
+                break
+            for atom in node.get_criterion().atoms():
+                feature = atom.feature()
+                if feature is None:
+                    if all(atom is not other for other in self._opaque):
+                        self._opaque.append(atom)
+                elif feature[0] not in FEATURES:
+                    raise ValueError("Unknown feature {}".format(feature[0]))
+                else:
+                    codes = self._constants.setdefault(feature[0], {})
+                    codes.setdefault(feature[1], len(codes))
+        self._features = [(attrgetter(name), codes, len(codes)) for name, codes in self._constants.items()]
+
+        entries = 2 ** len(self._opaque)
+        for codes in self._constants.values():
+            entries *= len(codes) + 1
+        if entries > MAX_ENTRIES:
+            raise ValueError("The decision table would have {} entries".format(entries))
+        self._table: Dict[Tuple[int, ...], Union[Node, Dict[Tuple[bool, ...], Node]]] = {}
+        for key in itertools.product(*(range(len(codes) + 1) for codes in self._constants.values())):
+            by_outcome = {outcome: self.select_coded(key, outcome)
+                          for outcome in itertools.product((False, True), repeat=len(self._opaque))}
+            nodes = set(by_outcome.values())
+            self._table[key] = nodes.pop() if len(nodes) == 1 else by_outcome
+
+    def select_coded(self, key: Tuple[int, ...], outcome: Tuple[bool, ...]) -> Node:
+        """
+        Get the node of a turn by checking the criteria of the chain one by one, from the coded
+        features of the turn instead of the turn itself.
+
+        Parameters
+        ----------
+
+        key
+            Code of each feature, in the order of get_features.
+        outcome
+            Result of each criterion in get_opaque.
+        """
+        codes = dict(zip(self._constants, key))
+        outcomes = dict(zip(map(id, self._opaque), outcome))
+
+        def truth(atom: Criterion) -> bool:
+            feature = atom.feature()
+            if feature is None:
+                return outcomes[id(atom)]
+            return codes[feature[0]] == self._constants[feature[0]][feature[1]]
+
+        for node in self._nodes:
+            if node.get_successor() is None or node.get_criterion().evaluate(truth):
+                return node
+
+    def select(self, context: TurnContext) -> Node:
+        """
+        Same as Node.select over the chain.
+        """
+        try:
+            key = tuple([codes.get(read(context), other) for read, codes, other in self._features])
+        except TypeError:
+            key = tuple([_code(codes, other, read(context)) for read, codes, other in self._features])
+        entry = self._table[key]
+        if type(entry) is dict:
+            entry = entry[tuple([atom.check(context) for atom in self._opaque])]
+        return entry
+
+    def next(self, it: ConversationFlow, tracker: DialogueStateTracker,
+             recent_events: Optional[RecentEvents] = None) -> str:
+        """
+        Same as Node.next over the chain.
+        """
+        context = TurnContext(it, tracker, recent_events)
+        return self.select(context).handle(context)
+
+    def get_chain(self) -> Node:
+        return self._chain
+
+    def get_features(self) -> Dict[str, Dict[Any, int]]:
+        """
+        Get the features read for each turn, with the code of each constant they are compared with.
+        """
+        return self._constants
+
+    def get_opaque(self) -> List[Criterion]:
+        """
+        Get the criteria checked on the turns whose node depends on them.
+        """
+        return self._opaque
+
+    def __len__(self) -> int:
+        return len(self._table)
@@ -1,16 +1,17 @@
 import abc
-import json
-from tour.arch_designer import architecture_finder
-from tour.topic.topics import parse_topic
+from typing import Iterator, Optional
+
+from tour.arch_designer import FinderSessions
+from tour.flows.registry import FlowRegistry
+from tour.nlu.endpoints import NLUUnavailable
 from tour.visitor.next_topic import NextTopic
 
 from rasa.shared.core.trackers import DialogueStateTracker
 
+from tour.chain.context import TurnContext
 from tour.chain.criterion import Criterion
+from tour.chain.recent_events import RecentEvents
 from tour.conversation_flow.conversation_flow import ConversationFlow
-from tour import arch_designer
-
-architecture_finder_var = architecture_finder()
 
 class Node(metaclass=abc.ABCMeta):
     """
@@ -32,10 +33,10 @@ class Node(metaclass=abc.ABCMeta):
         """
         self._criterion = criterion
 
-    @abc.abstractmethod
-    def next(self, it: ConversationFlow, tracker: DialogueStateTracker) -> str:
+    def next(self, it: ConversationFlow, tracker: DialogueStateTracker,
+             recent_events: Optional[RecentEvents] = None) -> str:
         """
-        Abstract next method, that each concrete node has to define.
+        Does the function of the first node of the chain, from this one, whose criterion is checked.
 
         Author: Adrian
 
@@ -46,81 +47,119 @@ class Node(metaclass=abc.ABCMeta):
             Current conversation_flow to iterate over the conversation flow.
         tracker
             Rasa tracker.
+        recent_events
+            Last events of the conversation kept by the caller, read from the tracker otherwise.
+        """
+        context = TurnContext(it, tracker, recent_events)
+        return self.select(context).handle(context)
+
+    def select(self, context: TurnContext) -> "Node":
+        """
+        Get the first node of the chain, from this one, whose criterion is checked.
+        """
+        if self._criterion.check(context):
+            return self
+        return self._node.select(context)
+
+    @abc.abstractmethod
+    def handle(self, context: TurnContext) -> str:
+        """
+        Abstract function of the node, that each concrete node has to define. Called once its
+        criterion is checked.
+
+        Parameters
+        ----------
+
+        context
+            Values of the turn, with the conversation flow and the tracker.
         """
         raise NotImplementedError
 
+    def get_criterion(self) -> Optional[Criterion]:
+        return self._criterion
+
+    def get_successor(self) -> Optional["Node"]:
+        """
+        Get the node checked when the criterion of this one is not, None at the end of the chain.
+        """
+        return self._node
+
+    def chain(self) -> Iterator["Node"]:
+        """
+        Iterates over the nodes of the chain, from this one, in the order they are checked.
+        """
+        node = self
+        while node is not None:
+            yield node
+            node = node.get_successor()
+
 class NodeUtter(Node):
     def __init__(self, node: Node, criterion: Criterion, utter: str) -> None:
         super().__init__(criterion)
         self._node = node
         self._utter = utter
     
-    def next(self, it: ConversationFlow, tracker: DialogueStateTracker) -> str:
-        if self._criterion.check(it, tracker):
-            return self._utter
-        else:
-            return self._node.next(it, tracker)
+    def handle(self, context: TurnContext) -> str:
+        return self._utter
 
 class NodeExplainArchitecture(Node):
     
-    def __init__(self, node: Node, criterion: Criterion, flows: dict) -> None:
+    def __init__(self, node: Node, criterion: Criterion, flows: FlowRegistry, finders: FinderSessions) -> None:
         super().__init__(criterion)
         self._node = node
         self._flows = flows
+        self._finders = finders
     
-    def next(self, it: ConversationFlow, tracker: DialogueStateTracker) -> str:
-        if self._criterion.check(it, tracker):
-            arch = architecture_finder_var.get_last_architecture()
-            with open(self._flows[arch]) as file:
-                flow = [parse_topic(raw_topic) for raw_topic in json.load(file)]
-            it.load(flow)
-            return it.accept(NextTopic())
-        else:
-            return self._node.next(it, tracker)
+    def handle(self, context: TurnContext) -> str:
+        arch = self._finders.get(context.tracker.sender_id).get_last_architecture()
+        # None when the session of the sender was evicted, or no architecture was found yet.
+        if arch is None:
+            return "utter_no_architecture"
+        if arch not in self._flows:
+            return "utter_no_explain"
+        context.it.load(self._flows.instantiate(arch))
+        return context.it.accept(NextTopic())
         
 class NodeRequirement(Node):
 
-    def __init__(self, node: Node, criterion: Criterion, flows: dict) -> None:
+    def __init__(self, node: Node, criterion: Criterion, flows: FlowRegistry, finders: FinderSessions) -> None:
         super().__init__(criterion)
         self._node = node
         self._flows = flows
+        self._finders = finders
     
-    def next(self, it: ConversationFlow, tracker: DialogueStateTracker) -> str:
-        if self._criterion.check(it,tracker):
-            architecture_finder_var.add_requirement(tracker.latest_message.text)
-            arch = architecture_finder_var.find_architecture()
-            if arch is None:
-                return "utter_no_architecture"
-            else:
-                if arch in self._flows:
-                    return "utter_architecture"
-                else:
-                    return "utter_no_explain"               
+    def handle(self, context: TurnContext) -> str:
+        finder = self._finders.get(context.tracker.sender_id)
+        finder.add_requirement(context.message)
+        try:
+            arch = finder.find_architecture()
+        except NLUUnavailable:
+            return "utter_nlu_unavailable"
+        if arch is None:
+            return "utter_no_architecture"
         else:
-            return self._node.next(it, tracker)
+            if arch in self._flows:
+                return "utter_architecture"
+            else:
+                return "utter_no_explain"
 
 class NodeExplain(Node):
 
-    def __init__(self, node: Node, criterion: Criterion, flows: dict) -> None:
+    def __init__(self, node: Node, criterion: Criterion, flows: FlowRegistry) -> None:
         super().__init__(criterion)
         self._node = node
         self._flows = flows
     
-    def next(self, it: ConversationFlow, tracker: DialogueStateTracker) -> str:
-        if self._criterion.check(it,tracker):
-            tema = next(tracker.get_latest_entity_values("tema"), None)
-            if tema is None:
-                return "utter_no_tema"
-            else:
-                if tema in self._flows:
-                    with open(self._flows[tema]) as file:
-                        flow = [parse_topic(raw_topic) for raw_topic in json.load(file)]
-                    it.load(flow)
-                    return it.accept(NextTopic())
-                else:
-                    return "utter_no_explain"               
+    def handle(self, context: TurnContext) -> str:
+        tema = context.entity
+        if tema is None:
+            return "utter_no_tema"
         else:
-            return self._node.next(it, tracker)
+            if tema in self._flows:
+                context.it.load(self._flows.instantiate(tema))
+                return context.it.accept(NextTopic())
+            else:
+                return "utter_no_explain"
 
 class NodeGivesRequirement(Node):
 
@@ -128,13 +167,10 @@ class NodeGivesRequirement(Node):
         super().__init__(criterion)
         self._node = node
 
-    def next(self, it: ConversationFlow, tracker: DialogueStateTracker) -> str:
-        if self._criterion.check(it,tracker):
-            empty = []
-            it.load(empty)
-            return "utter_requirement"
-        else:
-            return self._node.next(it, tracker)
+    def handle(self, context: TurnContext) -> str:
+        empty = []
+        context.it.load(empty)
+        return "utter_requirement"
 
 class DefaultNode(Node):
     """
@@ -157,7 +193,13 @@ class DefaultNode(Node):
         """
         super().__init__(criterion)
 
-    def next(self, it: ConversationFlow, tracker: DialogueStateTracker) -> str:
+    def select(self, context: TurnContext) -> Node:
+        return self
+
+    def get_successor(self) -> Optional[Node]:
+        return None
+
+    def handle(self, context: TurnContext) -> str:
         """
         Default utter.
 
@@ -166,10 +208,8 @@ class DefaultNode(Node):
         Parameters
         ----------
 
-        it
-            Current conversation_flow to iterate over the conversation flow.
-        tracker
-            Rasa tracker.
+        context
+            Values of the turn, with the conversation flow and the tracker.
 
         Returns
         -------
@@ -201,29 +241,24 @@ class NodeActionListen(Node):
         super().__init__(criterion)
         self._node = node
 
-    def next(self, it: ConversationFlow, tracker: DialogueStateTracker) -> str:
+    def handle(self, context: TurnContext) -> str:
         """
-        If the criterion is true, it returns an "action_listen", else it checks the next node
+        Returns an "action_listen"
 
         Author: Adrian
 
         Parameters
         ----------
 
-        it
-            Current conversation_flow to iterate over the conversation flow.
-        tracker
-            Rasa tracker.
+        context
+            Values of the turn, with the conversation flow and the tracker.
 
         Returns
         -------
 
         Returns an "action_listen"
         """
-        if self._criterion.check(it,tracker):
-            return "action_listen"
-        else:
-            return self._node.next(it, tracker)
+        return "action_listen"
 
 
 class NodeRepeat(Node):
@@ -250,29 +285,24 @@ class NodeRepeat(Node):
         self._node = node
         super().__init__(criterion)
 
-    def next(self, it: ConversationFlow, tracker: DialogueStateTracker) -> str:
+    def handle(self, context: TurnContext) -> str:
         """
-        If the criterion is true, it repeats the current topic's explanation, else it checks the next node
+        Repeats the current topic's explanation
 
         Author: Tomas
 
         Parameters
         ----------
 
-        it
-            Current conversation_flow to iterate over the conversation flow.
-        tracker
-            Rasa tracker.
+        context
+            Values of the turn, with the conversation flow and the tracker.
 
         Returns
         -------
 
         Returns the current topic's explanation repetition
         """
-        if self._criterion.check(it,tracker):
-            return it.repeat()
-        else:
-            return self._node.next(it, tracker)
+        return context.it.repeat()
 
 
 class NodeNext(Node):
@@ -298,7 +328,7 @@ class NodeNext(Node):
         self._node = node
         super().__init__(criterion)
 
-    def next(self, it: ConversationFlow, tracker: DialogueStateTracker) -> str:
+    def handle(self, context: TurnContext) -> str:
         """
         Returns the next explanation from the conversation flow
 
@@ -307,18 +337,12 @@ class NodeNext(Node):
         Parameters
         ----------
 
-        it
-            Current conversation_flow to iterate over the conversation flow.
-        tracker
-            Rasa tracker.
+        context
+            Values of the turn, with the conversation flow and the tracker.
 
         Returns
         -------
 
-        Returns the next explanation from the conversation flow depending on the learning style from the conversation_flow if
-        the criterion is checked as true, otherwise it checks the next node.
+        Returns the next explanation from the conversation flow depending on the learning style from the conversation_flow.
         """
-        if self._criterion.check(it,tracker):
-            return it.accept(NextTopic())
-        else:
-            return self._node.next(it, tracker)
+        return context.it.accept(NextTopic())
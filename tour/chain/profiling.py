@@ -0,0 +1,293 @@
+"""
+Optional instrumentation of the chain of responsibility.
+
+ChainProfiler.instrument copies a chain with every node and criterion wrapped. The copy selects the
+same nodes, and records how many times each criterion is checked and is true, how many times each
+node does its function, and how long each one takes, network and file reads included. Durations go
+to histograms with power of two buckets, so recording one is a couple of integer operations. The
+records can be read as a JSON snapshot or as Prometheus text, together with the order and hits of
+the nodes of an AdaptiveChain given to track.
+
+The criterion records are only complete when the copy is walked node by node, with Node.select or
+AdaptiveChain. A Dispatcher built from it reads the features it codes straight from the TurnContext,
+so only its opaque criteria and the nodes record anything.
+"""
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from tour.chain.adaptive import AdaptiveChain
+from tour.chain.context import TurnContext
+from tour.chain.criterion import Criterion
+from tour.chain.node import Node
+
+# Bucket k holds the durations up to 2 ** (k + FIRST_BUCKET_BITS) ns, about 1us to 69s, and the last
+# one the longer ones.
+FIRST_BUCKET_BITS = 10
+BUCKETS = 28
+PREFIX = "tour_chain"
+
+
+class Histogram:
+    """
+    Durations grouped in power of two buckets.
+    """
+    __slots__ = ("counts", "count", "total_ns")
+
+    def __init__(self) -> None:
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total_ns = 0
+
+    def observe(self, ns: int) -> None:
+        self.counts[min(max((ns - 1).bit_length() - FIRST_BUCKET_BITS, 0), BUCKETS - 1)] += 1
+        self.count += 1
+        self.total_ns += ns
+
+    @staticmethod
+    def bound(bucket: int) -> float:
+        """
+        Get the longest duration of a bucket in seconds.
+        """
+        if bucket == BUCKETS - 1:
+            return float("inf")
+        return 2 ** (bucket + FIRST_BUCKET_BITS) / 1e9
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Get the bound of the bucket of the q quantile in seconds, None if nothing was observed.
+        """
+        if self.count == 0:
+            return None
+        target, cumulative = q * self.count, 0
+        for bucket, count in enumerate(self.counts):
+            cumulative += count
+            if count and cumulative >= target:
+                return self.bound(bucket)
+
+    def summary(self) -> Dict[str, Any]:
+        return {"count": self.count,
+                "seconds": self.total_ns / 1e9,
+                "mean_seconds": self.total_ns / 1e9 / self.count if self.count else None,
+                "p50_seconds": self.quantile(0.5),
+                "p95_seconds": self.quantile(0.95),
+                "p99_seconds": self.quantile(0.99)}
+
+
+class Stats:
+    """
+    Records of a node or a criterion. For a criterion, calls are its checks and hits the checks
+    that were true. For a node, calls are the times it did its function.
+    """
+    __slots__ = ("kind", "labels", "calls", "hits", "histogram")
+
+    def __init__(self, kind: str, labels: Tuple[Tuple[str, str], ...]) -> None:
+        self.kind = kind
+        self.labels = labels
+        self.calls = 0
+        self.hits = 0
+        self.histogram = Histogram()
+
+
+def describe(criterion: Criterion) -> str:
+    """
+    Get a description of a criterion, like AndCriterion(EqualAction('action_listen'), EmptyFlow()).
+    """
+    if isinstance(criterion, ProfiledCriterion):
+        return describe(criterion.get_inner())
+    arguments = [describe(value) if isinstance(value, Criterion) else repr(value) for value in vars(criterion).values()]
+    return "{}({})".format(type(criterion).__name__, ", ".join(arguments))
+
+
+class ProfiledCriterion(Criterion):
+    """
+    Criterion that records the checks of another one.
+    """
+    def __init__(self, criterion: Criterion, stats: Stats) -> None:
+        self._criterion = criterion
+        self._stats = stats
+        self._atom = next(criterion.atoms()) is criterion
+
+    def check(self, context: TurnContext) -> bool:
+        start = time.perf_counter_ns()
+        result = self._criterion.check(context)
+        self._stats.histogram.observe(time.perf_counter_ns() - start)
+        self._stats.calls += 1
+        if result:
+            self._stats.hits += 1
+        return result
+
+    def feature(self) -> Optional[Tuple[str, Any]]:
+        return self._criterion.feature()
+
+    def atoms(self) -> Iterator[Criterion]:
+        if self._atom:
+            yield self
+        else:
+            yield from self._criterion.atoms()
+
+    def evaluate(self, truth: Callable[[Criterion], bool]) -> bool:
+        return truth(self) if self._atom else self._criterion.evaluate(truth)
+
+    def get_inner(self) -> Criterion:
+        return self._criterion
+
+
+class ProfiledNode(Node):
+    """
+    Node that records the function of another one. Its criterion and the rest of the chain are
+    profiled as well.
+    """
+    def __init__(self, node: Node, profiler: "ChainProfiler", position: int = 0) -> None:
+        name = type(node).__name__
+        criterion = node.get_criterion()
+        if criterion is not None:
+            criterion = criterion.wrap(lambda sub_criterion: ProfiledCriterion(
+                sub_criterion, profiler.stats("criterion", node=name, position=str(position),
+                                              criterion=describe(sub_criterion))))
+        super().__init__(criterion)
+        successor = node.get_successor()
+        self._node = None if successor is None else ProfiledNode(successor, profiler, position + 1)
+        self._inner = node
+        self._stats = profiler.stats("node", node=name, position=str(position))
+
+    def select(self, context: TurnContext) -> Node:
+        if self._node is None:
+            return self
+        return super().select(context)
+
+    def handle(self, context: TurnContext) -> str:
+        start = time.perf_counter_ns()
+        try:
+            return self._inner.handle(context)
+        finally:
+            self._stats.histogram.observe(time.perf_counter_ns() - start)
+            self._stats.calls += 1
+
+    def get_inner(self) -> Node:
+        return self._inner
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...], **extra: str) -> str:
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                          for key, value in pairs) + "}"
+
+
+class ChainProfiler:
+    """
+    Records of the nodes and criteria of the chains it instruments, and of the turns.
+    """
+    def __init__(self) -> None:
+        self._stats: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Stats] = {}
+        self._lock = threading.Lock()
+        self._adaptive: Optional[AdaptiveChain] = None
+        self.turns = Histogram()
+
+    def stats(self, kind: str, **labels: str) -> Stats:
+        """
+        Get the records of a node or a criterion, the same ones for the same labels.
+        """
+        key = (kind, tuple(labels.items()))
+        with self._lock:
+            if key not in self._stats:
+                self._stats[key] = Stats(kind, key[1])
+            return self._stats[key]
+
+    def instrument(self, chain: Node) -> Node:
+        """
+        Get a profiled copy of the chain, with the same nodes and criteria underneath.
+        """
+        return ProfiledNode(chain, self)
+
+    def track(self, chain: AdaptiveChain) -> None:
+        """
+        Adds the order and the hits of the nodes of an AdaptiveChain to the records.
+        """
+        self._adaptive = chain
+
+    def observe_turn(self, ns: int) -> None:
+        self.turns.observe(ns)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get the records as a JSON serializable dict.
+        """
+        records: Dict[str, List[Dict[str, Any]]] = {"node": [], "criterion": []}
+        for stats in list(self._stats.values()):
+            record = dict(stats.labels)
+            record["calls"] = stats.calls
+            if stats.kind == "criterion":
+                record["hits"] = stats.hits
+            record.update(stats.histogram.summary())
+            del record["count"]
+            records[stats.kind].append(record)
+        snapshot = {"turns": self.turns.summary(), "nodes": records["node"], "criteria": records["criterion"]}
+        if self._adaptive is not None:
+            snapshot["adaptive"] = {"reorders": self._adaptive.reorders, "nodes": self._adaptive.stats()}
+        return snapshot
+
+    def prometheus(self) -> str:
+        """
+        Get the records in the Prometheus text format.
+        """
+        lines = []
+
+        def histogram(name: str, labels: Tuple[Tuple[str, str], ...], values: Histogram) -> None:
+            cumulative = 0
+            for bucket, count in enumerate(values.counts[:-1]):
+                cumulative += count
+                lines.append("{}_bucket{} {}".format(name, _labels(labels, le=repr(Histogram.bound(bucket))), cumulative))
+            lines.append("{}_bucket{} {}".format(name, _labels(labels, le="+Inf"), values.count))
+            lines.append("{}_sum{} {}".format(name, _labels(labels), values.total_ns / 1e9))
+            lines.append("{}_count{} {}".format(name, _labels(labels), values.count))
+
+        lines += ["# HELP {}_turn_seconds Time to choose and do the action of a turn.".format(PREFIX),
+                  "# TYPE {}_turn_seconds histogram".format(PREFIX)]
+        histogram(PREFIX + "_turn_seconds", (), self.turns)
+        stats = list(self._stats.values())
+        for kind, description in (("node", "Time doing the function of a node."),
+                                  ("criterion", "Time checking a criterion.")):
+            lines += ["# HELP {}_{}_seconds {}".format(PREFIX, kind, description),
+                      "# TYPE {}_{}_seconds histogram".format(PREFIX, kind)]
+            for record in stats:
+                if record.kind == kind:
+                    histogram("{}_{}_seconds".format(PREFIX, kind), record.labels, record.histogram)
+        lines += ["# HELP {}_criterion_hits_total Checks of a criterion that were true.".format(PREFIX),
+                  "# TYPE {}_criterion_hits_total counter".format(PREFIX)]
+        lines += ["{}_criterion_hits_total{} {}".format(PREFIX, _labels(record.labels), record.hits)
+                  for record in stats if record.kind == "criterion"]
+        if self._adaptive is not None:
+            nodes = self._adaptive.stats()
+            for name, kind, description, key in (
+                    ("adaptive_hits_total", "counter", "Turns handled by a node of the adaptive chain.", "total_hits"),
+                    ("adaptive_position", "gauge", "Position of a node in the order the adaptive chain checks them.",
+                     "position")):
+                lines += ["# HELP {}_{} {}".format(PREFIX, name, description),
+                          "# TYPE {}_{} {}".format(PREFIX, name, kind)]
+                lines += ["{}_{}{} {}".format(PREFIX, name, _labels((("node", node["node"]),
+                                                                      ("chain_position", str(node["chain_position"])))),
+                                               node[key])
+                          for node in nodes]
+            lines += ["# HELP {}_adaptive_reorders_total Reorders of the adaptive chain.".format(PREFIX),
+                      "# TYPE {}_adaptive_reorders_total counter".format(PREFIX),
+                      "{}_adaptive_reorders_total {}".format(PREFIX, self._adaptive.reorders)]
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str) -> None:
+        """
+        Writes the records to a file, as Prometheus text if it ends with .prom and as JSON otherwise.
+        The file is replaced at once, so readers never see half of it.
+        """
+        if path.endswith(".prom"):
+            content = self.prometheus()
+        else:
+            content = json.dumps(self.snapshot(), indent=2)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as file:
+            file.write(content)
+        os.replace(tmp_path, path)
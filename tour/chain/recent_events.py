@@ -0,0 +1,93 @@
+from collections import deque
+from itertools import islice
+from typing import Any, Deque, NamedTuple, Optional, Sequence
+
+from rasa.shared.core.events import ActionExecuted, BotUttered, UserUttered
+
+
+class RecentEvent(NamedTuple):
+    """
+    What the criteria compare of an event: its type and the name of the action, the intent or the
+    response it is about, None for other events.
+    """
+    kind: str
+    name: Optional[str]
+
+
+def recent_event(event: Any) -> RecentEvent:
+    if isinstance(event, ActionExecuted):
+        return RecentEvent("action", event.action_name)
+    if isinstance(event, UserUttered):
+        return RecentEvent("intent", event.intent_name)
+    if isinstance(event, BotUttered):
+        return RecentEvent("bot", (getattr(event, "metadata", None) or {}).get("utter_action"))
+    return RecentEvent(type(event).__name__, None)
+
+
+class RecentEvents:
+    """
+    Last events of a conversation, kept up to date turn by turn.
+
+    update only reads the events added since the previous turn, so the work of a turn does not grow
+    with the length of the conversation. If the history changed in any other way, like after a
+    rewind, the window is built again from its last events.
+    """
+    def __init__(self, size: int = 8) -> None:
+        """
+        Constructor.
+
+        Parameters
+        ----------
+
+        size
+            Amount of events kept.
+        """
+        self._window: Deque[RecentEvent] = deque(maxlen=size)
+        self._seen = 0
+        self._last = None
+
+    @classmethod
+    def from_events(cls, events: Sequence[Any], size: int = 8) -> "RecentEvents":
+        recent = cls(size)
+        recent.update(events)
+        return recent
+
+    def update(self, events: Sequence[Any]) -> None:
+        """
+        Adds the events added to the conversation since the previous call.
+
+        Parameters
+        ----------
+
+        events
+            Every event of the conversation, like the events of a Rasa tracker. Only its last ones
+            are read.
+        """
+        added = len(events) - self._seen
+        if added < 0 or (self._seen > 0 and events[-added - 1] != self._last):
+            self._window.clear()
+            added = len(events)
+        if added > 0:
+            self._window.extend(recent_event(event) for event in
+                                reversed(list(islice(reversed(events), min(added, self._window.maxlen)))))
+            self._last = events[-1]
+        self._seen = len(events)
+
+    def get(self, position: int) -> Optional[RecentEvent]:
+        """
+        Get an event counting from the end of the conversation, -1 being the latest one.
+
+        Returns
+        -------
+
+        None if the conversation is shorter or the event is older than the window.
+        """
+        if -position > len(self._window):
+            return None
+        return self._window[position]
+
+    def __len__(self) -> int:
+        """
+        Amount of events of the conversation, not only the ones kept.
+        """
+        return self._seen
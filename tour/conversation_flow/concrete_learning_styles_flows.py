@@ -2,6 +2,7 @@ import json
 from tour.topic.topics import Topic
 from typing import Dict, List
 from tour.conversation_flow.conversation_flow import ConversationFlow
+from tour.visitor.next_topic import NextTopic
 from tour.visitor.visitor import Visitor
 
 
@@ -17,7 +18,7 @@ class Sequential(ConversationFlow):
 
     def accept(self, visitor: Visitor) -> str:
         """
-        Accepts the visitor
+        Accepts the visitor. NextTopic follows the plan of the flow when possible.
 
         Author: Tomas
 
@@ -26,6 +27,8 @@ class Sequential(ConversationFlow):
 
         Utter associated to the visitor functionality.
         """
+        if type(visitor) is NextTopic and self.follows_plan():
+            return self.next_in_plan()
         return visitor.visit_sequential(self)
 
 
@@ -1,12 +1,23 @@
 import abc
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional, Tuple
 
-from tour.topic.topics import Topic
+from tour.flows.compiled import CompiledFlow
+from tour.topic.topics import FlowState, Topic
 
 
 class ConversationFlow(metaclass=abc.ABCMeta):
     """
     Saves the conversation flow.
+
+    The topics to explain are a stack. Its bottom holds the top level topics not explained yet, in
+    reverse order, and only those are counted. Over them, the visitors push the path of sub topics
+    being explained, whose positions are indexed by topic id. So checking whether a topic is in
+    the flow or still to explain, and jumping to a topic, do not depend on the size of the flow.
+
+    When the flow is the top level topics of one compiled flow, the learning styles can follow the
+    plan of the compiled flow instead of searching for the next topic, see next_in_plan. The plan
+    is left, and the visitors used, as soon as the topics to explain are changed by other means
+    than NextTopic, repeat, restart or jump_to_topic.
     """
     def __init__(self, intents_to_topics: Dict[str, str], flow: List[Topic]):
         """
@@ -22,23 +33,142 @@ class ConversationFlow(metaclass=abc.ABCMeta):
         flow
             List of topics saved in flow.json.
         """
-        all_topics = {}
-        for topic in flow:
-            all_topics.update(topic.get())
         if len(intents_to_topics)==0:
             self._intents_to_topics={}
         else:
-            self._intents_to_topics = {intent: all_topics[topic] for
+            self._intents_to_topics = {intent: self._find_topic(flow, topic) for
                                    intent, topic in intents_to_topics.items()}
 
-        self._flow = flow
-        self._to_explain = [topic for topic in reversed(flow)]
         self._jump = None
         self._current_topic = None
+        self.load(flow)
+
+    @staticmethod
+    def _find_topic(flow: List[Topic], topic_id: str) -> Topic:
+        for root in flow:
+            topic = root.find(topic_id)
+            if topic is not None:
+                return topic
+        raise KeyError(topic_id)
 
     def load(self, flow: List[Topic]):
         self._flow = flow
-        self._to_explain = [topic for topic in reversed(flow)]
+        compiled = flow[0].get_compiled_flow() if flow else None
+        if compiled is not None and len(flow) == len(compiled.roots) and \
+                all(topic.get_compiled_flow() is compiled and compiled.root_index[topic.get_id()] == i
+                    for i, topic in enumerate(flow)):
+            # The top level topics of one compiled flow, it already has their positions.
+            self._root_index = compiled.root_index
+            self._compiled = compiled
+        else:
+            self._root_index = {topic.get_id(): i for i, topic in enumerate(flow)}
+            self._compiled = None
+        self._reset_to_explain()
+        # The plan can only be followed from the beginning.
+        self._plan_cursor = 0 if self._compiled is not None and flow[0].get_state().is_fresh() else None
+
+    def _reset_to_explain(self):
+        self._to_explain = [topic for topic in reversed(self._flow)]
+        # Top level topics at the bottom of the stack, and positions of each topic over them.
+        self._roots_to_explain = len(self._to_explain)
+        self._path_positions = {}
+
+    def _position(self, topic: Topic) -> Optional[int]:
+        """
+        Position of the topic closest to the top of the stack, None if it is not in the stack.
+        """
+        positions = self._path_positions.get(topic.get_id())
+        if positions:
+            return positions[-1]
+        root = self._root_index.get(topic.get_id())
+        if root is not None and len(self._flow) - 1 - root < self._roots_to_explain:
+            return len(self._flow) - 1 - root
+        return None
+
+    def _truncate(self, size: int):
+        """
+        Removes the topics over the first size ones of the stack.
+        """
+        if size <= self._roots_to_explain:
+            self._roots_to_explain = size
+            self._path_positions.clear()
+        else:
+            for topic in self._to_explain[size:]:
+                positions = self._path_positions[topic.get_id()]
+                positions.pop()
+                if not positions:
+                    del self._path_positions[topic.get_id()]
+        del self._to_explain[size:]
+
+    def _push(self, topic: Topic):
+        self._path_positions.setdefault(topic.get_id(), []).append(len(self._to_explain))
+        self._to_explain.append(topic)
+
+    def follows_plan(self) -> bool:
+        """
+        Checks if the next topic can be taken from the plan of the compiled flow.
+        """
+        return self._plan_cursor is not None
+
+    def next_in_plan(self) -> str:
+        """
+        Explains the next topic of the sequential plan, with the same result and side effects as
+        NextTopic.visit_sequential: the topics explained before are marked as explained and popped
+        down to the parent of the planned topic, which is pushed and explained.
+
+        Returns
+        -------
+
+        Utter associated to the next explanation, "utter_final" at the end of the plan.
+        """
+        plan = self._compiled.plan
+        parent_id = None
+        if self._plan_cursor < len(plan):
+            parent_id = self._compiled.ids[self._compiled.parents[plan[self._plan_cursor]]]
+        while len(self._to_explain) > 0 and self._to_explain[-1].get_id() != parent_id:
+            self._to_explain[-1].get_explanation()
+            self._truncate(len(self._to_explain) - 1)
+        if len(self._to_explain) == 0:
+            return "utter_final"
+        parent = self._to_explain[-1]
+        parent.get_explanation()
+        topic = parent.next()
+        self._push(topic)
+        self._plan_cursor += 1
+        return topic.get_explanation()
+
+    def get_compiled_flow(self) -> Optional[CompiledFlow]:
+        """
+        Get the compiled flow whose top level topics are the flow, None if the flow is not one.
+        """
+        return self._compiled
+
+    def get_flow_state(self) -> Optional[FlowState]:
+        """
+        Get the progress over the topics of the flow, None if there is no flow.
+        """
+        return self._flow[0].get_state() if self._flow else None
+
+    def export_to_explain(self) -> Tuple[int, List[int], Optional[int]]:
+        """
+        Get the topics to explain as the amount of top level topics at the bottom of the stack, the
+        compiled flow indexes of the topics over them and the position in the plan, None if the plan
+        is not followed.
+        """
+        return (self._roots_to_explain, [topic.get_index() for topic in self._to_explain[self._roots_to_explain:]],
+                self._plan_cursor)
+
+    def restore_to_explain(self, roots_to_explain: int, path: List[int], plan_cursor: Optional[int]):
+        """
+        Sets the topics to explain from the values of export_to_explain. The flow has to be the top
+        level topics of a compiled flow.
+        """
+        self._reset_to_explain()
+        self._truncate(roots_to_explain)
+        state = self._flow[0].get_state()
+        for index in path:
+            self._push(Topic(self._compiled, index, state))
+        self._plan_cursor = plan_cursor
 
     def in_tour(self, intent_name: str) -> bool:
         return intent_name in self._intents_to_topics
@@ -125,9 +255,33 @@ class ConversationFlow(metaclass=abc.ABCMeta):
         """
         return self._to_explain.copy()
     
+    def peek(self) -> Topic:
+        """
+        Get the next topic to explain without copying the topics to explain.
+
+        Raises
+        ------
+
+        IndexError
+            If there are no topics to explain.
+        """
+        return self._to_explain[-1]
+
+    def size(self) -> int:
+        """
+        Get the amount of topics to explain.
+        """
+        return len(self._to_explain)
+
+    def iter_to_explain(self) -> Iterator[Topic]:
+        """
+        Iterates over the topics to explain, from the next one to the last one, without copying them.
+        """
+        return reversed(self._to_explain)
+
     def topic_in_flow(self, topic : Topic) -> bool:
 
-        return topic in self._flow
+        return topic.get_id() in self._root_index
 
     def get_intents_to_topic(self) -> Dict:
         """
@@ -158,10 +312,7 @@ class ConversationFlow(metaclass=abc.ABCMeta):
 
         Returns a boolean value to check if the topic was explained or not
         """
-        if topic in self._to_explain:
-            return False
-        else:
-            return True
+        return self._position(topic) is None
 
     def restart(self):
         """
@@ -169,9 +320,10 @@ class ConversationFlow(metaclass=abc.ABCMeta):
 
         Author: Tomas
         """
-        self._to_explain = [topic for topic in reversed(self._flow)]
+        self._reset_to_explain()
         for topic in self._to_explain:
             topic.restart()
+        self._plan_cursor = 0 if self._compiled is not None else None
 
     def get_last_topic(self) -> Topic:
         """
@@ -184,13 +336,15 @@ class ConversationFlow(metaclass=abc.ABCMeta):
         Topic with the previous topic in conversation flow.
         """
         i = 1
-        while self._to_explain[-i] not in self._flow:
+        while not self.topic_in_flow(self._to_explain[-i]):
             i += 1
         return self._to_explain[-i]
 
     def jump_to_topic(self, topic: Topic):
         """
-        Jumps to the specified topic
+        Jumps to the specified topic: the topics to explain over it are dropped, and so are the sub
+        topics under its top level topic, which is marked as explained. If the topic is not to
+        explain anymore the flow is restarted first.
 
         Author: Tomas
 
@@ -201,17 +355,30 @@ class ConversationFlow(metaclass=abc.ABCMeta):
         """
         # Jumps to the specified topic
         if topic.get_id() in self._intents_to_topics:
-            while len(self._to_explain) == 0 or self._to_explain[-1] != topic:
-                if len(self._to_explain) > 0:
-                    self._to_explain.pop()
-                else:
-                    self.restart()
-            while self._to_explain[-1] not in self._flow:
-                self._to_explain.pop()
-            self._to_explain[-1].set_explained(True)
+            position = self._position(topic)
+            if position is None:
+                root = topic.get_path()[0]
+                if not self.topic_in_flow(root):
+                    return
+                self.restart()
+                position = self._position(root)
+            self._truncate(position + 1)
+            while not self.topic_in_flow(self._to_explain[-1]):
+                self._truncate(len(self._to_explain) - 1)
+            root = self._to_explain[-1]
+            root.set_explained(True)
+            if self._plan_cursor is not None:
+                # The plan continues with the next sub topic of the top level topic.
+                index = self._compiled.roots[self._root_index[root.get_id()]]
+                sub_topics = self._compiled.children[index]
+                explained = root.get_amount_subtopics()
+                next_index = sub_topics[explained] if explained < len(sub_topics) else self._compiled.ends[index]
+                self._plan_cursor = self._compiled.plan_positions[next_index]
 
     def pop_not_explained_topic(self):
-        self._to_explain.pop()
+        self._plan_cursor = None
+        self._truncate(len(self._to_explain) - 1)
 
     def append_topic_to_explain(self, topic : Topic):
-        self._to_explain.append(topic)
+        self._plan_cursor = None
+        self._push(topic)
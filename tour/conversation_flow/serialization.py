@@ -0,0 +1,187 @@
+"""
+Compact encoding of the progress of a conversation flow, so it can be kept in a tracker slot or a
+key value store and restored in any process.
+
+Layout, little endian:
+
+    header       format version, learning style, jump (0 None, 1 False, 2 True), compressed (u8)
+    flow         length of the flow name (u16) and the name, length 0 when no flow is loaded
+    current      length of the current topic (u16, 0xFFFF for None) and the topic id
+    body         zlib compressed when compressed is 1:
+                 fingerprint and amount of topics of the compiled flow (u32, u32), top level topics
+                 at the bottom of the stack (u32), plan position (u32, 0xFFFFFFFF when not followed),
+                 amount of topics over them (u32) and their indexes (u32 each), explained flags
+                 (u8 each), then detail levels, example, sub topic and question cursors (u16 each)
+"""
+import base64
+import struct
+import zlib
+from array import array
+from typing import Dict, List, Optional, Union
+
+from tour.conversation_flow.concrete_learning_styles_flows import Global, Sequential
+from tour.conversation_flow.conversation_flow import ConversationFlow
+from tour.flows.binary import UINT32, from_bytes, to_bytes
+from tour.flows.compiled import CompiledFlow
+from tour.flows.registry import FlowRegistry
+from tour.topic.topics import FlowState, Topic
+
+# 2 since the length of the flow name is a u16.
+FORMAT_VERSION = 2
+STYLES = (Sequential, Global)
+HEADER = struct.Struct("<BBBB")
+NAME_LENGTH = struct.Struct("<H")
+BODY = struct.Struct("<IIIII")
+NO_CURRENT_TOPIC = 0xFFFF
+NO_PLAN = 0xFFFFFFFF
+JUMPS = (None, False, True)
+# Smaller bodies are not worth compressing.
+COMPRESS_FROM = 1024
+CURSORS = ("detail_level", "current_example", "current_sub_topic", "current_question")
+
+
+class StaleFlowState(ValueError):
+    """
+    Raised when the progress was saved over another version of its flow.
+    """
+
+
+def dumps(it: ConversationFlow) -> bytes:
+    """
+    Encodes the progress of a conversation flow.
+
+    Raises
+    ------
+
+    ValueError
+        If the flow was not loaded from a FlowRegistry, its name is longer than 65535 bytes or the
+        id of the current topic is longer than 65534 bytes.
+    """
+    style = STYLES.index(type(it))
+    current_topic = it.get_current_topic()
+    current = b"" if current_topic is None else current_topic.encode("utf-8")
+    # 0xFFFF stands for no current topic.
+    if len(current) >= NO_CURRENT_TOPIC:
+        raise ValueError("The current topic {}... is longer than 65534 bytes".format(current_topic[:40]))
+    parts = [None, b"", struct.pack("<H", NO_CURRENT_TOPIC if current_topic is None else len(current)), current]
+    compressed = 0
+    if it.has_flow():
+        compiled = it.get_compiled_flow()
+        if compiled is None:
+            raise ValueError("Only flows loaded from a FlowRegistry can be serialized")
+        name = compiled.name.encode("utf-8")
+        if len(name) > 0xFFFF:
+            raise ValueError("The name of flow {}... is longer than 65535 bytes".format(compiled.name[:40]))
+        parts[1] = NAME_LENGTH.pack(len(name)) + name
+        roots_to_explain, path, plan_cursor = it.export_to_explain()
+        state = it.get_flow_state()
+        body = b"".join([BODY.pack(compiled.fingerprint, len(compiled), roots_to_explain,
+                                   NO_PLAN if plan_cursor is None else plan_cursor, len(path)),
+                         to_bytes(array(UINT32, path)), bytes(state.explained)] +
+                        [to_bytes(getattr(state, cursor)) for cursor in CURSORS])
+        if len(body) >= COMPRESS_FROM:
+            body, compressed = zlib.compress(body, 1), 1
+        parts.append(body)
+    else:
+        parts[1] = NAME_LENGTH.pack(0)
+    parts[0] = HEADER.pack(FORMAT_VERSION, style, JUMPS.index(it.get_jump()), compressed)
+    return b"".join(parts)
+
+
+def loads(data: bytes, flows: Union[FlowRegistry, Dict[str, CompiledFlow]],
+          intents_to_topics: Optional[Dict[str, str]] = None) -> ConversationFlow:
+    """
+    Restores a conversation flow encoded by dumps.
+
+    Parameters
+    ----------
+
+    data
+        Encoded progress.
+    flows
+        Registry with the flow of the conversation, or compiled flows by name.
+    intents_to_topics
+        Same as in the ConversationFlow constructor.
+
+    Raises
+    ------
+
+    StaleFlowState
+        If the flow changed since the progress was saved, or intents_to_topics has topics that are
+        not in it.
+    ValueError
+        If data is not a valid encoding or its flow is not in the registry.
+    """
+    try:
+        version, style, jump, compressed = HEADER.unpack_from(data)
+        if version != FORMAT_VERSION:
+            raise ValueError("Conversation flow format {} is not supported".format(version))
+        position = HEADER.size
+        name_length, = NAME_LENGTH.unpack_from(data, position)
+        position += NAME_LENGTH.size
+        name = data[position:position + name_length].decode("utf-8")
+        position += name_length
+        current_length, = struct.unpack_from("<H", data, position)
+        position += 2
+        current_topic = None
+        if current_length != NO_CURRENT_TOPIC:
+            current_topic = data[position:position + current_length].decode("utf-8")
+            position += current_length
+        if position > len(data):
+            raise ValueError("Not a valid conversation flow encoding: truncated")
+        it_class = STYLES[style]
+        if not name:
+            it = _new_flow(it_class, name, intents_to_topics or {}, [])
+        else:
+            it = _load_flow(it_class, name, data[position:], compressed, flows, intents_to_topics or {})
+        it.set_jump(JUMPS[jump])
+        it.set_current_topic(current_topic)
+        return it
+    except (struct.error, IndexError, UnicodeDecodeError, zlib.error) as error:
+        raise ValueError("Not a valid conversation flow encoding: {}".format(error))
+
+
+def _new_flow(it_class: type, name: str, intents_to_topics: Dict[str, str], topics: List[Topic]) -> ConversationFlow:
+    try:
+        return it_class(intents_to_topics, topics)
+    except KeyError as error:
+        raise StaleFlowState("Topic {} of intents_to_topics is not in the flow {!r}".format(error.args[0], name))
+
+
+def _load_flow(it_class: type, name: str, body: bytes, compressed: int,
+               flows: Union[FlowRegistry, Dict[str, CompiledFlow]],
+               intents_to_topics: Dict[str, str]) -> ConversationFlow:
+    if name not in flows:
+        raise ValueError("Unknown flow {}".format(name))
+    compiled = flows.get(name)
+    if compressed:
+        body = zlib.decompress(body)
+    fingerprint, n, roots_to_explain, plan_cursor, path_length = BODY.unpack_from(body)
+    if fingerprint != compiled.fingerprint or n != len(compiled):
+        raise StaleFlowState("Flow {} changed since the progress was saved".format(name))
+    position = BODY.size
+    path = from_bytes(body[position:position + 4 * path_length]).tolist()
+    position += 4 * path_length
+    if len(body) != position + 9 * n or roots_to_explain > len(compiled.roots) or any(i >= n for i in path):
+        raise ValueError("Not a valid conversation flow encoding")
+    state = FlowState.__new__(FlowState)
+    state.explained = bytearray(body[position:position + n])
+    position += n
+    for cursor in CURSORS:
+        setattr(state, cursor, from_bytes(body[position:position + 2 * n], "H"))
+        position += 2 * n
+    it = _new_flow(it_class, name, intents_to_topics, compiled.instantiate(state))
+    it.restore_to_explain(roots_to_explain, path, None if plan_cursor == NO_PLAN else plan_cursor)
+    return it
+
+
+def dumps_text(it: ConversationFlow) -> str:
+    """
+    Same as dumps, as ASCII text for slots and stores that only take strings.
+    """
+    return base64.b64encode(dumps(it)).decode("ascii")
+
+
+def loads_text(text: str, flows: Union[FlowRegistry, Dict[str, CompiledFlow]],
+               intents_to_topics: Optional[Dict[str, str]] = None) -> ConversationFlow:
+    return loads(base64.b64decode(text), flows, intents_to_topics)
@@ -0,0 +1,183 @@
+"""
+Binary artifact with many compiled flows, written by tour.flows.build and read at startup with a
+single read.
+
+Layout, little endian:
+
+    header       magic b"TFLW", format version (u16), amount of strings (u32), amount of flows (u32)
+    strings      u32 end offset of each string, then the UTF-8 bytes of every string
+    flow index   per flow: name, source path (string indexes, u32), source mtime in ns (u64),
+                 offset and length of its record in the file (u64, u32)
+    records      per flow an u32 array: amount of topics n, amount of roots, roots, ids, and for
+                 utters, examples, questions and children n + 1 offsets followed by the values
+
+Every string (topic ids, utter names, paths) is stored once and shared by all the flows.
+"""
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+from tour.flows.compiled import CompiledFlow
+
+MAGIC = b"TFLW"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHII")
+INDEX_ENTRY = struct.Struct("<IIQQI")
+UINT32 = "I" if array("I").itemsize == 4 else "L"
+FIELDS = ("utters", "examples", "questions", "children")
+
+
+class FlowEntry(NamedTuple):
+    """
+    Index entry of one flow in an artifact.
+    """
+    name: str
+    path: str
+    mtime_ns: int
+    offset: int
+    length: int
+
+
+def to_bytes(values: array) -> bytes:
+    """
+    Little endian bytes of an array.
+    """
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def from_bytes(data: bytes, typecode: str = UINT32) -> array:
+    """
+    Array from the little endian bytes of to_bytes.
+    """
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def dumps(flows: Iterable[Tuple[CompiledFlow, str, int]]) -> bytes:
+    """
+    Encodes compiled flows.
+
+    Parameters
+    ----------
+
+    flows
+        (flow, source path, source mtime in ns) of each flow.
+    """
+    strings = {}
+
+    def intern(text: str) -> int:
+        return strings.setdefault(text, len(strings))
+
+    entries, records = [], []
+    for flow, path, mtime_ns in flows:
+        record = array(UINT32, [len(flow), len(flow.roots)])
+        record.extend(flow.roots)
+        record.extend(intern(topic_id) for topic_id in flow.ids)
+        for field in FIELDS:
+            values = getattr(flow, field)
+            offsets, flat = [0], []
+            for items in values:
+                flat.extend(items if field == "children" else (intern(item) for item in items))
+                offsets.append(len(flat))
+            record.extend(offsets)
+            record.extend(flat)
+        entries.append((intern(flow.name), intern(path), mtime_ns))
+        records.append(to_bytes(record))
+
+    encoded = [text.encode("utf-8") for text in strings]
+    ends, end = array(UINT32), 0
+    for text in encoded:
+        end += len(text)
+        ends.append(end)
+    head = [HEADER.pack(MAGIC, FORMAT_VERSION, len(encoded), len(records)), to_bytes(ends), b"".join(encoded)]
+    offset = sum(len(part) for part in head) + INDEX_ENTRY.size * len(records)
+    index = []
+    for (name, path, mtime_ns), record in zip(entries, records):
+        index.append(INDEX_ENTRY.pack(name, path, mtime_ns, offset, len(record)))
+        offset += len(record)
+    return b"".join(head + index + records)
+
+
+class Artifact:
+    """
+    Decoded header, strings and index of an artifact. Flows are decoded when asked for.
+    """
+    def __init__(self, data: bytes):
+        """
+        Constructor.
+
+        Raises
+        ------
+
+        ValueError
+            If data is not an artifact of this format version.
+        """
+        if len(data) < HEADER.size:
+            raise ValueError("Not a flow artifact")
+        magic, version, n_strings, n_flows = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not a flow artifact")
+        if version != FORMAT_VERSION:
+            raise ValueError("Flow artifact version {} is not supported, rebuild it".format(version))
+        position = HEADER.size
+        ends = from_bytes(data[position:position + 4 * n_strings])
+        position += 4 * n_strings
+        blob = data[position:position + (ends[-1] if n_strings else 0)]
+        position += len(blob)
+        starts = [0] + ends[:-1].tolist()
+        self.strings = [blob[start:end].decode("utf-8") for start, end in zip(starts, ends)]
+        self.index = {}
+        for _ in range(n_flows):
+            name, path, mtime_ns, offset, length = INDEX_ENTRY.unpack_from(data, position)
+            position += INDEX_ENTRY.size
+            self.index[self.strings[name]] = FlowEntry(self.strings[name], self.strings[path], mtime_ns, offset, length)
+        self._data = data
+
+    @staticmethod
+    def read(path: str) -> "Artifact":
+        with open(path, "rb") as file:
+            return Artifact(file.read())
+
+    def names(self) -> List[str]:
+        return list(self.index)
+
+    def flow(self, name: str) -> CompiledFlow:
+        """
+        Decodes one flow.
+
+        Raises
+        ------
+
+        KeyError
+            If the artifact has no flow with that name.
+        """
+        entry = self.index[name]
+        record = from_bytes(self._data[entry.offset:entry.offset + entry.length]).tolist()
+        strings = self.strings
+        n, n_roots = record[0], record[1]
+        position = 2
+        roots = tuple(record[position:position + n_roots])
+        position += n_roots
+        ids = tuple([strings[i] for i in record[position:position + n]])
+        position += n
+        fields = []
+        for field in FIELDS:
+            offsets = record[position:position + n + 1]
+            position += n + 1
+            flat = record[position:position + offsets[-1]]
+            position += offsets[-1]
+            if field != "children":
+                flat = [strings[i] for i in flat]
+            fields.append(tuple([tuple(flat[start:end]) for start, end in zip(offsets, offsets[1:])]))
+        utters, examples, questions, children = fields
+        return CompiledFlow(name, ids, utters, examples, questions, children, roots)
+
+    def flows(self) -> Dict[str, CompiledFlow]:
+        return {name: self.flow(name) for name in self.index}
@@ -0,0 +1,96 @@
+"""
+Validates flow files and compiles them into one binary artifact, loaded by the policy at startup.
+
+Usage:
+
+    python -m tour.flows.build -o info/flows.bin info/scrum.json info/layers.json
+
+Each flow is named after its file, so info/scrum.json is the flow "scrum". With --check the flows
+are only validated. Exits with 1 if any flow is not valid.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+from typing import List, Tuple
+
+from tour.flows.binary import dumps
+from tour.flows.compiled import CompiledFlow
+from tour.flows.validation import FlowValidationError, validate_flow
+
+DEFAULT_SOURCES = r"info/*.json"
+DEFAULT_OUTPUT = r"info/flows.bin"
+
+
+def flow_name(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def compile_file(path: str) -> Tuple[CompiledFlow, str, int]:
+    """
+    Validates and compiles one flow file.
+
+    Raises
+    ------
+
+    FlowValidationError
+        If the flow is not valid.
+    """
+    name = flow_name(path)
+    mtime_ns = os.stat(path).st_mtime_ns
+    with open(path) as file:
+        try:
+            raw_topics = json.load(file)
+        except ValueError as error:
+            raise FlowValidationError(name, ["{} is not valid JSON: {}".format(path, error)])
+    problems = validate_flow(raw_topics)
+    if problems:
+        raise FlowValidationError(name, problems)
+    return CompiledFlow.from_raw(name, raw_topics), path, mtime_ns
+
+
+def build(paths: List[str], output: str = None) -> List[FlowValidationError]:
+    """
+    Compiles the flow files into the artifact. Nothing is written if any flow is not valid.
+
+    Returns
+    -------
+
+    Validation errors found.
+    """
+    compiled, errors = [], []
+    for path in paths:
+        try:
+            compiled.append(compile_file(path))
+        except FlowValidationError as error:
+            errors.append(error)
+    names = [flow.name for flow, _, _ in compiled]
+    for name in sorted({name for name in names if names.count(name) > 1}):
+        errors.append(FlowValidationError(name, ["more than one file is named {}".format(name)]))
+    if not errors and output is not None:
+        tmp_path = output + ".tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(dumps(compiled))
+        os.replace(tmp_path, output)
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validates flow files and compiles them into a binary artifact.")
+    parser.add_argument("paths", nargs="*", help="Flow files, " + DEFAULT_SOURCES + " by default")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--check", action="store_true", help="Only validate the flows")
+    args = parser.parse_args()
+
+    paths = args.paths or sorted(glob.glob(DEFAULT_SOURCES))
+    errors = build(paths, None if args.check else args.output)
+    for error in errors:
+        print(error, file=sys.stderr)
+    if errors:
+        sys.exit(1)
+    print("{} flows {}".format(len(paths), "valid" if args.check else "written to " + args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import glob
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from tour.flows.binary import Artifact
+from tour.flows.compiled import CompiledFlow
+from tour.flows.registry import FlowRegistry
+
+
+def scan(directory: str) -> Dict[str, str]:
+    """
+    Get the flow files of a directory, each one named after its file.
+    """
+    paths = sorted(glob.glob(os.path.join(directory, "*.json")))
+    return {os.path.splitext(os.path.basename(path))[0]: path for path in paths}
+
+
+class FlowCatalog(FlowRegistry):
+    """
+    Every flow of a directory, without loading them up front.
+
+    At startup only the directory listing and, if there is one, the index of the artifact built by
+    tour.flows.build are read. A flow is loaded the first time a user asks for it, from the artifact
+    if its file did not change since the build, or from its file otherwise. At most max_resident flows
+    are kept loaded, the least recently used one is dropped first.
+    """
+    def __init__(self, directory: str, artifact_path: Optional[str] = None, max_resident: int = 64):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+
+        directory
+            Directory with the flow files.
+        artifact_path
+            Artifact built from the directory, ignored if it does not exist.
+        max_resident
+            Amount of flows kept loaded.
+        """
+        super().__init__(scan(directory))
+        self._directory = directory
+        self._flows = OrderedDict()
+        self._artifact = None
+        if artifact_path is not None and os.path.exists(artifact_path):
+            self._artifact = Artifact.read(artifact_path)
+        self._max_resident = max_resident
+        self.loads = 0
+        self.evictions = 0
+        self._load_seconds = 0.0
+        self._max_load_seconds = 0.0
+
+    def get(self, name: str) -> CompiledFlow:
+        with self._lock:
+            flow = self._flows.get(name)
+            if flow is not None:
+                self._flows.move_to_end(name)
+                return flow
+            if name not in self._paths:
+                raise KeyError(name)
+            start = time.perf_counter()
+            flow = self._flows[name] = self._load(name)
+            seconds = time.perf_counter() - start
+            self.loads += 1
+            self._load_seconds += seconds
+            self._max_load_seconds = max(self._max_load_seconds, seconds)
+            while len(self._flows) > self._max_resident:
+                self._flows.popitem(last=False)
+                self.evictions += 1
+            return flow
+
+    def _load(self, name: str) -> CompiledFlow:
+        path = self._paths[name]
+        entry = None if self._artifact is None else self._artifact.index.get(name)
+        if entry is not None and os.path.normpath(entry.path) == os.path.normpath(path):
+            try:
+                up_to_date = os.stat(path).st_mtime_ns == entry.mtime_ns
+            except OSError:
+                up_to_date = False
+            if up_to_date:
+                self._mtimes[name] = entry.mtime_ns
+                self._sources[name] = "artifact"
+                return self._artifact.flow(name)
+        return self._compile(name)
+
+    def rescan(self) -> List[str]:
+        """
+        Picks up the flow files added to or removed from the directory.
+
+        Returns
+        -------
+
+        Names of the added flows.
+        """
+        paths = scan(self._directory)
+        added = [name for name in paths if name not in self._paths]
+        with self._lock:
+            self._paths = paths
+            for name in [name for name in self._flows if name not in paths]:
+                del self._flows[name]
+        return added
+
+    def reload_changed(self) -> List[str]:
+        self.rescan()
+        return super().reload_changed()
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Get the size of the catalog, the amount of loaded flows and the latency of the loads.
+        """
+        return {"flows": len(self._paths),
+                "resident": len(self._flows),
+                "max_resident": self._max_resident,
+                "artifact_flows": 0 if self._artifact is None else len(self._artifact.index),
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "load_seconds_mean": self._load_seconds / self.loads if self.loads else None,
+                "load_seconds_max": self._max_load_seconds}
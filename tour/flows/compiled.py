@@ -0,0 +1,139 @@
+import sys
+import zlib
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+from tour.topic.topics import MAX_CURSOR, FlowState, Topic
+
+TOPIC_TYPES = ("simple",)
+
+
+class CompiledFlow:
+    """
+    Immutable form of a flow file, parsed once and shared by every conversation.
+
+    Topics are flattened in depth first order into parallel tuples, so the topic with index i has
+    id ids[i], explanations utters[i] and sub topics children[i] (indexes into the same tuples).
+    Because of that order the topics of the tree under topic i have the indexes i to ends[i] - 1.
+    parents[i] is the index of the topic that has topic i as sub topic, -1 for top level topics.
+    index maps each topic id to its index and root_index each top level topic id to its position
+    in roots.
+
+    plan is the traversal of the sequential learning style: the sub topics, top level topics
+    excluded, in the order NextTopic explains them, which is depth first order. plan_positions[i]
+    is the position in plan of topic i, or of the first planned topic after it.
+
+    fingerprint changes when the topics or their tree change, so progress saved over another version
+    of the flow can be told apart. detail_levels are the initial detail levels of a FlowState.
+    """
+    __slots__ = ("name", "ids", "utters", "examples", "questions", "children", "roots", "parents", "ends",
+                 "index", "root_index", "plan", "plan_positions", "fingerprint", "detail_levels")
+
+    def __init__(self, name: str, ids: Tuple[str, ...], utters: Tuple[Tuple[str, ...], ...],
+                 examples: Tuple[Tuple[str, ...], ...], questions: Tuple[Tuple[str, ...], ...],
+                 children: Tuple[Tuple[int, ...], ...], roots: Tuple[int, ...]):
+        self.name = name
+        self.ids = ids
+        self.utters = utters
+        self.examples = examples
+        self.questions = questions
+        self.children = children
+        self.roots = roots
+        parents = [-1] * len(ids)
+        ends = list(range(1, len(ids) + 1))
+        for i in reversed(range(len(ids))):
+            if children[i]:
+                ends[i] = ends[children[i][-1]]
+            for child in children[i]:
+                parents[child] = i
+        self.parents = tuple(parents)
+        self.ends = tuple(ends)
+        self.index = {topic_id: i for i, topic_id in enumerate(ids)}
+        self.root_index = {ids[root]: i for i, root in enumerate(roots)}
+        self.plan = tuple(i for i, parent in enumerate(self.parents) if parent >= 0)
+        plan_positions = [0] * (len(ids) + 1)
+        for i, parent in enumerate(self.parents):
+            plan_positions[i + 1] = plan_positions[i] + (parent >= 0)
+        self.plan_positions = tuple(plan_positions)
+        self.detail_levels = array("H", [len(topic_utters) // 2 for topic_utters in utters]).tobytes()
+        self.fingerprint = zlib.crc32(repr((ids, utters, examples, questions, children, roots)).encode("utf-8"))
+
+    @staticmethod
+    def from_raw(name: str, raw_topics: List[Dict[str, Any]]) -> "CompiledFlow":
+        """
+        Compiles the content of a flow file.
+
+        Parameters
+        ----------
+
+        name
+            Name of the flow, like "scrum".
+        raw_topics
+            Topics as they are in the flow file.
+
+        Raises
+        ------
+
+        ValueError
+            If a topic has a type parse_topic does not know, or more explanations, examples, sub
+            topics or questions than its cursors can count.
+        """
+        ids, utters, examples, questions, children = [], [], [], [], []
+
+        def add(raw_topic: Dict[str, Any]) -> int:
+            if raw_topic["type"] not in TOPIC_TYPES:
+                raise ValueError("Topic {} of flow {} has unknown type {}".format(
+                    raw_topic.get("topic_id"), name, raw_topic["type"]))
+            index = len(ids)
+            ids.append(raw_topic["topic_id"])
+            utters.append(tuple(raw_topic["utters"]))
+            examples.append(tuple(raw_topic.get("examples") or ()))
+            questions.append(tuple(raw_topic.get("questions") or ()))
+            children.append(())
+            children[index] = tuple(add(sub_topic) for sub_topic in raw_topic.get("sub_topics") or ())
+            if max(len(utters[index]), len(examples[index]), len(questions[index]), len(children[index])) > MAX_CURSOR:
+                raise ValueError("Topic {} of flow {} has more than {} explanations, examples, sub topics or "
+                                 "questions".format(raw_topic["topic_id"], name, MAX_CURSOR))
+            return index
+
+        roots = tuple(add(raw_topic) for raw_topic in raw_topics)
+        return CompiledFlow(name, tuple(ids), tuple(utters), tuple(examples), tuple(questions), tuple(children), roots)
+
+    def instantiate(self, state: Optional[FlowState] = None) -> List[Topic]:
+        """
+        Creates the topics of a conversation. They share the compiled content, the progress of the
+        conversation is kept in a FlowState.
+
+        Parameters
+        ----------
+
+        state
+            Progress to continue from, a new FlowState by default.
+
+        Returns
+        -------
+
+        Top level topics of the flow.
+        """
+        state = FlowState(self) if state is None else state
+        return [Topic(self, root, state) for root in self.roots]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def memory_size(self) -> int:
+        """
+        Approximate bytes used by the compiled flow, counting each shared object once.
+        """
+        seen = set()
+        size = 0
+        pending = [getattr(self, slot) for slot in self.__slots__]
+        while pending:
+            item = pending.pop()
+            if id(item) in seen:
+                continue
+            seen.add(id(item))
+            size += sys.getsizeof(item)
+            if isinstance(item, tuple):
+                pending.extend(item)
+        return size + sys.getsizeof(self)
@@ -0,0 +1,173 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from tour.flows.compiled import CompiledFlow
+from tour.flows.validation import FlowValidationError, validate_flow
+from tour.topic.topics import Topic
+
+logger = logging.getLogger(__name__)
+
+
+class FlowRegistry:
+    """
+    Flows that can be explained, each one parsed once from its file and shared by every conversation.
+
+    With watch(), a background thread recompiles the flows whose file changed and swaps them in.
+    Conversations that already loaded a flow keep the topics of the version they started with.
+    """
+    def __init__(self, paths: Dict[str, str]):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+
+        paths
+            Flow file of each flow name, like {"scrum": "info/scrum.json"}.
+        """
+        self._paths = dict(paths)
+        self._flows = {}
+        self._parses = defaultdict(int)
+        self._parse_seconds = defaultdict(float)
+        self._instances = defaultdict(int)
+        self._reloads = defaultdict(int)
+        self._sources = {}
+        self._mtimes = {}
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stop_watching = threading.Event()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._paths
+
+    def names(self) -> List[str]:
+        return list(self._paths)
+
+    def get(self, name: str) -> CompiledFlow:
+        """
+        Get the compiled flow, parsing its file the first time.
+
+        Raises
+        ------
+
+        KeyError
+            If there is no flow with that name.
+        """
+        flow = self._flows.get(name)
+        if flow is None:
+            with self._lock:
+                flow = self._flows.get(name)
+                if flow is None:
+                    flow = self._flows[name] = self._compile(name)
+        return flow
+
+    def instantiate(self, name: str) -> List[Topic]:
+        """
+        Get the topics of the flow for one conversation, without reading the flow file.
+        """
+        topics = self.get(name).instantiate()
+        self._instances[name] += 1
+        return topics
+
+    def _compile(self, name: str) -> CompiledFlow:
+        """
+        Raises
+        ------
+
+        FlowValidationError
+            If the flow file does not follow the flow schema.
+        """
+        path = self._paths[name]
+        start = time.perf_counter()
+        # Taken before reading, so an edit made while reading is picked up by the next check.
+        self._mtimes[name] = os.stat(path).st_mtime_ns
+        with open(path) as file:
+            raw_topics = json.load(file)
+        problems = validate_flow(raw_topics)
+        if problems:
+            raise FlowValidationError(name, problems)
+        flow = CompiledFlow.from_raw(name, raw_topics)
+        self._parses[name] += 1
+        self._parse_seconds[name] += time.perf_counter() - start
+        self._sources[name] = "json"
+        return flow
+
+    def reload_changed(self) -> List[str]:
+        """
+        Recompiles the compiled flows whose file changed since they were compiled. A flow that fails
+        to compile, like a file saved half written, keeps its previous version.
+
+        Returns
+        -------
+
+        Names of the reloaded flows.
+        """
+        reloaded = []
+        for name in list(self._flows):
+            try:
+                changed = os.stat(self._paths[name]).st_mtime_ns != self._mtimes.get(name)
+            except OSError:
+                continue
+            if not changed:
+                continue
+            try:
+                flow = self._compile(name)
+            except (OSError, ValueError) as error:
+                logger.warning("Keeping the previous version of flow %s, it failed to compile: %s", name, error)
+                continue
+            # Requests see either the old or the new flow.
+            with self._lock:
+                if name not in self._flows:
+                    continue
+                self._flows[name] = flow
+            self._reloads[name] += 1
+            reloaded.append(name)
+            logger.info("Reloaded flow %s", name)
+        return reloaded
+
+    def watch(self, interval: float = 2.0):
+        """
+        Starts a background thread that calls reload_changed every interval seconds.
+        """
+        if self._watcher is not None:
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="flow-watcher", daemon=True)
+        self._watcher.start()
+
+    def _watch(self, interval: float):
+        while not self._stop_watching.wait(interval):
+            try:
+                self.reload_changed()
+            except Exception:
+                logger.exception("Flow watcher failed")
+
+    def stop_watching(self, timeout: Optional[float] = None):
+        if self._watcher is not None:
+            self._stop_watching.set()
+            self._watcher.join(timeout)
+            self._watcher = None
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get, for each flow, where it was loaded from ("json" or "artifact"), how many times its file was
+        parsed and reloaded, how many conversations got it, how many topics it has and the approximate
+        bytes of its compiled form (None if not loaded yet).
+        """
+        stats = {}
+        for name in self._paths:
+            flow = self._flows.get(name)
+            stats[name] = {"path": self._paths[name],
+                           "source": self._sources.get(name),
+                           "parses": self._parses[name],
+                           "parse_seconds": self._parse_seconds[name],
+                           "reloads": self._reloads[name],
+                           "instances": self._instances[name],
+                           "topics": None if flow is None else len(flow),
+                           "memory_bytes": None if flow is None else flow.memory_size()}
+        return stats
@@ -0,0 +1,70 @@
+from typing import Any, List
+
+from tour.flows.compiled import TOPIC_TYPES
+
+LIST_FIELDS = ("utters", "examples", "questions")
+
+
+class FlowValidationError(ValueError):
+    """
+    Raised when a flow file does not follow the flow schema.
+    """
+    def __init__(self, name: str, problems: List[str]):
+        super().__init__("Flow {} is not valid:\n  {}".format(name, "\n  ".join(problems)))
+        self.name = name
+        self.problems = problems
+
+
+def validate_flow(raw_topics: Any) -> List[str]:
+    """
+    Checks the content of a flow file against the flow schema: a list of topics, each one with a
+    unique "topic_id", a known "type", a non empty list of "utters", optional lists of "examples" and
+    "questions", and optional "sub_topics" following the same schema.
+
+    Parameters
+    ----------
+
+    raw_topics
+        Content of the flow file.
+
+    Returns
+    -------
+
+    Problems found, empty if the flow is valid.
+    """
+    problems = []
+    seen_ids = set()
+
+    def check_topics(topics: Any, where: str):
+        if not isinstance(topics, list):
+            problems.append("{} must be a list of topics".format(where))
+            return
+        for i, topic in enumerate(topics):
+            check_topic(topic, "{}[{}]".format(where, i))
+
+    def check_topic(topic: Any, where: str):
+        if not isinstance(topic, dict):
+            problems.append("{} must be an object".format(where))
+            return
+        topic_id = topic.get("topic_id")
+        if not isinstance(topic_id, str) or not topic_id:
+            problems.append("{} has no topic_id".format(where))
+        else:
+            where = "{} ({})".format(where, topic_id)
+            if topic_id in seen_ids:
+                problems.append("{} repeats topic_id {}".format(where, topic_id))
+            seen_ids.add(topic_id)
+        if topic.get("type") not in TOPIC_TYPES:
+            problems.append("{} has unknown type {!r}, expected one of {}".format(where, topic.get("type"), TOPIC_TYPES))
+        if not topic.get("utters"):
+            problems.append("{} has no utters".format(where))
+        for field in LIST_FIELDS:
+            values = topic.get(field)
+            if values is not None and (not isinstance(values, list) or
+                                       not all(isinstance(value, str) for value in values)):
+                problems.append("{} {} must be a list of utter names".format(where, field))
+        if topic.get("sub_topics") is not None:
+            check_topics(topic["sub_topics"], where + ".sub_topics")
+
+    check_topics(raw_topics, "flow")
+    return problems
@@ -1,7 +1,12 @@
 import json
 import logging
+import time
 from tour.arch_designer import architecture_finder
 from tour.loading_script import functions_builder
+from tour.chain.adaptive import AdaptiveChain
+from tour.chain.dispatch import Dispatcher
+from tour.chain.profiling import ChainProfiler
+from tour.chain.recent_events import RecentEvents
 from tour.chain.node import Node, DefaultNode, NodeActionListen,  NodeNext, NodeRepeat
 from tour.chain.criterion import AndCriterion, EqualAction, EqualEntity, EqualIntent, EqualPenultimateIntent, \
     NotCriterion, OrCriterion
@@ -30,6 +35,9 @@ OLD_DEFAULT_MAX_HISTORY = 5
 BESTY_POLICY_PRIORITY = 10
 #DEFAULT_LEARNING_STYLE = 'neutral'
 LEARNING_STYLE_CONFIDENCE = 3
+# Ways of selecting the node of a turn: looking it up in the decision table of the chain, or
+# walking the chain with its most selected nodes checked first.
+CHAIN_RUNTIMES = ("table", "adaptive")
 
 
 def count_intents_from_stories(s, story_intents):
@@ -74,12 +82,43 @@ class LearningStylePolicy(Policy):
             #usertype: Optional[dict] = None,
             #story_profiles: Optional[dict] = None,
             #learning_style: Optional[str] = None,
+            profile: bool = False,
+            profile_path: Optional[Text] = None,
+            profile_every: int = 100,
+            chain_runtime: Text = "table",
             **kwargs: Any,
     ) -> None:
         super().__init__(featurizer, priority, **kwargs)
+        if chain_runtime not in CHAIN_RUNTIMES:
+            raise ValueError("Unknown chain_runtime {!r}, expected one of {}".format(chain_runtime, CHAIN_RUNTIMES))
         # to do script
-        self._functions = functions_builder()
+        chain = functions_builder()
+        self._chain_runtime = chain_runtime
+        # With profile, the nodes and criteria record their calls and latency, and every profile_every
+        # turns the records are written to profile_path, as Prometheus text if it ends with .prom.
+        self._profile = profile
+        self._profile_path = profile_path
+        self._profile_every = profile_every
+        self._profiler = ChainProfiler() if profile else None
+        if self._profiler is not None:
+            chain = self._profiler.instrument(chain)
+        if chain_runtime == "adaptive":
+            self._functions = AdaptiveChain(chain)
+            if self._profiler is not None:
+                self._profiler.track(self._functions)
+        elif self._profiler is not None:
+            # The chain is walked node by node, the decision table would skip the criteria it codes.
+            self._functions = chain
+        else:
+            try:
+                # Same choices as the chain, looked up in its decision table.
+                self._functions = Dispatcher(chain)
+            except ValueError as error:
+                logger.warning("No decision table for the chain, using the adaptive runtime: %s", error)
+                self._functions = AdaptiveChain(chain)
         self._users  = {}
+        # Last events of each conversation, updated with the new events of every turn.
+        self._recent_events = {}
 
     def train(
             self,
@@ -113,12 +152,36 @@ class LearningStylePolicy(Policy):
                 self._users[id] = Global({},[])
             else:
                 self._users[id] = Sequential({},[])
-
-        return self._prediction(confidence_scores_for(self._functions.next(self._users[id], tracker), 1.0, domain))
+            self._recent_events[id] = RecentEvents()
+        self._recent_events[id].update(tracker.events)
+
+        if self._profiler is None:
+            action = self._functions.next(self._users[id], tracker, self._recent_events[id])
+        else:
+            start = time.perf_counter_ns()
+            action = self._functions.next(self._users[id], tracker, self._recent_events[id])
+            self._profiler.observe_turn(time.perf_counter_ns() - start)
+            if self._profile_path is not None and self._profiler.turns.count % self._profile_every == 0:
+                self._profiler.dump(self._profile_path)
+        return self._prediction(confidence_scores_for(action, 1.0, domain))
+
+    def get_profiler(self) -> Optional[ChainProfiler]:
+        return self._profiler
+
+    def get_adaptive_chain(self) -> Optional[AdaptiveChain]:
+        """
+        Get the AdaptiveChain that selects the nodes, with its order and the hits of each node in
+        stats(), None with the decision table.
+        """
+        return self._functions if isinstance(self._functions, AdaptiveChain) else None
 
     def _metadata(self) -> Dict[Text, Any]:
         return {
             "priority": self.priority,
+            "profile": self._profile,
+            "profile_path": self._profile_path,
+            "profile_every": self._profile_every,
+            "chain_runtime": self._chain_runtime,
             #"story_profiles": self.story_profiles,
             #"usertype": self.usertype
         }
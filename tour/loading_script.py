@@ -1,4 +1,12 @@
 
+from typing import Optional
+
+from tour.arch_designer import FinderSessions, architecture_finder
+from tour.flows.catalog import FlowCatalog
+from tour.flows.registry import FlowRegistry
+from tour.nlu.cache import CachedScorer, ParseCache
+from tour.nlu.endpoints import EndpointPool
+from tour.nlu.scorer import NLU_URL, HttpScorer
 from tour.conversation_flow.conversation_flow import ConversationFlow
 from tour.chain.node import Node, DefaultNode, NodeActionListen, NodeExplain, NodeExplainArchitecture, NodeGivesRequirement, NodeNext, NodeRepeat, NodeRequirement, NodeUtter
 from tour.chain.criterion import AndCriterion, EmptyFlow, EqualAction, EqualEntity, EqualIntent, EqualMessage, EqualPenultimateIntent, \
@@ -7,24 +15,55 @@ from tour.chain.criterion import AndCriterion, EmptyFlow, EqualAction, EqualEnti
 PATH_FLOW = r"info/flow.json"
 PATH_INTENTS_TO_TOPICS = r"info/intents_to_topics.json"
 
-FLOWS_PATHS = {"scrum" : r"info/scrum.json", 
-                "layers" : r"info/layers.json"}
+# Every *.json file of the directory is a flow, named after the file.
+FLOWS_DIR = r"info"
+# Built with python -m tour.flows.build, the flow files are parsed instead when it is missing.
+FLOWS_ARTIFACT = r"info/flows.bin"
+# Flows kept loaded, the least recently used are loaded again when needed.
+FLOWS_MAX_RESIDENT = 64
+# Seconds between checks for edited flow files, None to never reload them.
+FLOWS_RELOAD_INTERVAL = 2.0
+
+# Replicas of the architectures NLU server, see architectures_data/launch.md
+NLU_URLS = [NLU_URL]
+# Parse results shared by every conversation, None to send every combination to the NLU server.
+NLU_CACHE_MAX_ENTRIES = 10000
+# Seconds a parse result is reused, None to keep it until it is evicted.
+NLU_CACHE_TTL = 3600.0
+# JSON file that keeps the parse results across restarts, None to keep them in memory only.
+NLU_CACHE_PATH = None
+
+
+def default_finders() -> FinderSessions:
+    # Every conversation shares the pool, so they all see the same endpoint health, and the cache,
+    # so a combination scored for one conversation is reused by the others.
+    pool = EndpointPool(NLU_URLS, hedge_quantile=0.95 if len(NLU_URLS) > 1 else None)
+    if NLU_CACHE_MAX_ENTRIES is None:
+        return FinderSessions(lambda: architecture_finder(scorer=HttpScorer(pool=pool)))
+    cache = ParseCache(NLU_CACHE_MAX_ENTRIES, NLU_CACHE_TTL, NLU_CACHE_PATH)
+    return FinderSessions(lambda: architecture_finder(scorer=CachedScorer(HttpScorer(pool=pool), cache=cache)))
+
 
-def functions_builder() -> Node:
+def functions_builder(finders: Optional[FinderSessions] = None, flows: Optional[FlowRegistry] = None) -> Node:
+    finders = finders if finders is not None else default_finders()
+    if flows is None:
+        flows = FlowCatalog(FLOWS_DIR, FLOWS_ARTIFACT, FLOWS_MAX_RESIDENT)
+        if FLOWS_RELOAD_INTERVAL is not None:
+            flows.watch(FLOWS_RELOAD_INTERVAL)
     node1 = DefaultNode(None)
     node1 = NodeActionListen(node1,NotCriterion(EqualAction("action_listen")))
-    node1 = NodeRequirement(node1, AndCriterion(EqualAction("action_listen"),EmptyFlow()),FLOWS_PATHS)
+    node1 = NodeRequirement(node1, AndCriterion(EqualAction("action_listen"),EmptyFlow()),flows, finders)
     node1 = NodeNext(node1, 
         AndCriterion(NotCriterion(EmptyFlow()),AndCriterion(
         AndCriterion(NotCriterion(EqualPenultimateIntent("utter_final")), EqualAction("action_listen")),
         EqualIntent("affirm"))))
     node1 = NodeExplain(node1, AndCriterion(EqualAction("action_listen"),
     OrCriterion(AndCriterion(EqualIntent("explicame_tema"),NotCriterion(EqualEntity(None))), 
-    AndCriterion(EqualIntent("no_entiendo"), NotCriterion(EqualEntity(None))))),FLOWS_PATHS)
+    AndCriterion(EqualIntent("no_entiendo"), NotCriterion(EqualEntity(None))))),flows)
     node1 = NodeGivesRequirement(node1, OrCriterion(EqualAction("utter_final"),AndCriterion(EqualAction("action_listen"),EqualIntent("dar_requerimientos"))))
     node1 = NodeRepeat(node1, AndCriterion(NotCriterion(EmptyFlow()),AndCriterion(EqualAction("action_listen"),
         OrCriterion(AndCriterion(EqualIntent("no_entiendo"), EqualEntity(None)), EqualIntent("deny")))))
-    node1 = NodeExplainArchitecture(node1, AndCriterion(EqualMessage("A R Q U I T E C T U R A"),EqualAction("action_listen")), FLOWS_PATHS)
+    node1 = NodeExplainArchitecture(node1, AndCriterion(EqualMessage("A R Q U I T E C T U R A"),EqualAction("action_listen")), flows, finders)
     node1 = NodeUtter(node1,EqualIntent("greet"),"utter_greet")
     return node1
 
@@ -0,0 +1,86 @@
+"""
+Stand-in for the architectures NLU server that also classifies lists of texts.
+
+It loads the trained NLU model in process and serves:
+
+    POST /model/parse        {"text": "..."}        -> parse result
+    POST /model/parse_batch  {"texts": ["...", ...]} -> list of parse results
+    GET  /status                                    -> {"model_file": "..."}
+
+Usage (from architectures_data):
+
+    python -m tour.nlu.batch_server -m models/nlu-20211010 -p 5001
+"""
+import argparse
+import json
+import logging
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, Dict, List
+
+from rasa.model import get_model, get_model_subdirectories
+from rasa.nlu.model import Interpreter
+
+logger = logging.getLogger(__name__)
+
+
+class BatchParser:
+    """
+    Wraps a loaded NLU interpreter.
+    """
+    def __init__(self, model_path: str) -> None:
+        self.model_file = model_path
+        _, nlu_path = get_model_subdirectories(get_model(model_path))
+        self._interpreter = Interpreter.load(nlu_path)
+
+    def parse(self, text: str) -> Dict[str, Any]:
+        return self._interpreter.parse(text)
+
+    def parse_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        return [self._interpreter.parse(text) for text in texts]
+
+
+def make_handler(parser: BatchParser):
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path == "/status":
+                self._reply(200, {"model_file": parser.model_file})
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path == "/model/parse":
+                self._reply(200, parser.parse(body["text"]))
+            elif self.path == "/model/parse_batch":
+                self._reply(200, parser.parse_batch(body["texts"]))
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def _reply(self, status: int, payload: Any):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            logger.debug(format, *args)
+
+    return Handler
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Architectures NLU server with a batch parse endpoint.")
+    arg_parser.add_argument("-m", "--model", required=True, help="Trained model (.tar.gz or directory).")
+    arg_parser.add_argument("-p", "--port", type=int, default=5001)
+    args = arg_parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    server = HTTPServer(("", args.port), make_handler(BatchParser(args.model)))
+    logger.info("Serving %s on port %s", args.model, args.port)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
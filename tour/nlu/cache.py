@@ -0,0 +1,205 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from tour.nlu.scorer import Scorer
+
+CACHE_FORMAT_VERSION = 1
+
+
+class ParseCache:
+    """
+    Bounded cache of NLU parse results with least recently used eviction and a time to live.
+
+    Combinations are stored under an order-insensitive key, so the same requirements given in any
+    order share an entry.
+    """
+    def __init__(self, max_entries: int = 10000, ttl: Optional[float] = 3600.0, path: Optional[str] = None,
+                 save_interval: float = 300.0):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+
+        max_entries
+            Maximum amount of parse results kept. The least recently used one is evicted first.
+        ttl
+            Seconds a parse result stays valid, None to keep it until it is evicted.
+        path
+            JSON file used to keep the cache across restarts. It is loaded here if it exists.
+        save_interval
+            Minimum seconds between two writes of the file done by save_if_due.
+        """
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._path = path
+        self._save_interval = save_interval
+        self._last_save = time.monotonic()
+        self._entries = OrderedDict()
+        self.model_version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    @staticmethod
+    def key(combination: Sequence[str]) -> Tuple[str, ...]:
+        """
+        Canonical form of a combination of requirements.
+        """
+        return tuple(sorted(combination))
+
+    def get(self, combination: Sequence[str]) -> Optional[Dict[str, Any]]:
+        """
+        Get the parse result of a combination.
+
+        Returns
+        -------
+
+        The cached parse result, or None if it is missing or expired.
+        """
+        key = self.key(combination)
+        entry = self._entries.get(key)
+        if entry is not None and self._ttl is not None and time.time() - entry[0] > self._ttl:
+            del self._entries[key]
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, combination: Sequence[str], response: Dict[str, Any]):
+        key = self.key(combination)
+        self._entries[key] = (time.time(), response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def set_model_version(self, version: Optional[str]) -> bool:
+        """
+        Drops every entry if the NLU model changed.
+
+        Parameters
+        ----------
+
+        version
+            Version of the model currently answering the parse requests.
+
+        Returns
+        -------
+
+        True if the cache was invalidated.
+        """
+        if version == self.model_version:
+            return False
+        self.clear()
+        self.model_version = version
+        return True
+
+    def clear(self):
+        self._entries.clear()
+
+    def save(self):
+        """
+        Writes the cache to its path, replacing the previous file.
+        """
+        data = {"format": CACHE_FORMAT_VERSION,
+                "model_version": self.model_version,
+                "entries": [[list(key), stored_at, response] for key, (stored_at, response) in self._entries.items()]}
+        tmp_path = self._path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(data, file)
+        os.replace(tmp_path, self._path)
+        self._last_save = time.monotonic()
+
+    def save_if_due(self):
+        """
+        Saves the cache if it has a path and the save interval has passed since the last write.
+        """
+        if self._path is not None and time.monotonic() - self._last_save >= self._save_interval:
+            self.save()
+
+    def load(self):
+        """
+        Reads the cache from its path. Files written by another format are ignored.
+        """
+        with open(self._path) as file:
+            data = json.load(file)
+        if data.get("format") != CACHE_FORMAT_VERSION:
+            return
+        self.clear()
+        self.model_version = data["model_version"]
+        for key, stored_at, response in data["entries"]:
+            self._entries[tuple(key)] = (stored_at, response)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "expirations": self.expirations, "model_version": self.model_version}
+
+
+class CachedScorer(Scorer):
+    """
+    Scorer that only asks another scorer for the combinations missing in a ParseCache.
+    """
+    def __init__(self, scorer: Scorer, cache: Optional[ParseCache] = None, version_check_interval: float = 60.0):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+
+        scorer
+            Scorer used on cache misses.
+        cache
+            Cache to use, it can be shared by several scorers.
+        version_check_interval
+            Seconds between checks of the model version. The cache is invalidated when it changes.
+        """
+        super().__init__()
+        self._scorer = scorer
+        self.cache = cache if cache is not None else ParseCache()
+        self._version_check_interval = version_check_interval
+        self._last_version_check = None
+
+    def score(self, combinations: List[Sequence[str]]) -> List[Dict[str, Any]]:
+        self._check_model_version()
+        responses = [self.cache.get(combination) for combination in combinations]
+        missing = {}
+        for combination, response in zip(combinations, responses):
+            if response is None:
+                missing.setdefault(ParseCache.key(combination), combination)
+        if missing:
+            round_trips = self._scorer.round_trips
+            scored = dict(zip(missing.keys(), self._scorer.score(list(missing.values()))))
+            self.round_trips += self._scorer.round_trips - round_trips
+            for key, combination in missing.items():
+                self.cache.put(combination, scored[key])
+            self.cache.save_if_due()
+            responses = [scored[ParseCache.key(combination)] if response is None else response
+                         for combination, response in zip(combinations, responses)]
+        return responses
+
+    def model_version(self) -> Optional[str]:
+        return self._scorer.model_version()
+
+    def _check_model_version(self):
+        now = time.monotonic()
+        if self._last_version_check is None or now - self._last_version_check >= self._version_check_interval:
+            self._last_version_check = now
+            version = self._scorer.model_version()
+            if version is not None:
+                self.cache.set_model_version(version)
@@ -0,0 +1,226 @@
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+BALANCING = ("round_robin", "least_outstanding")
+MIN_LATENCY_SAMPLES = 20
+
+
+class NLUUnavailable(Exception):
+    """
+    Raised when no NLU endpoint can answer, so the caller can fall back instead of waiting.
+    """
+
+
+class Endpoint:
+    """
+    One replica of the NLU server, with its own circuit breaker.
+    """
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def is_available(self, now: float) -> bool:
+        return self.open_until <= now
+
+
+class EndpointPool:
+    """
+    Pool of equivalent NLU endpoints, like several replicas of the architectures server.
+
+    Each request goes to the endpoint chosen by the balancing strategy and has a timeout. Once enough
+    latencies are known, a request that takes longer than the hedge quantile (p95 by default) is
+    duplicated on another endpoint and the first answer wins. An endpoint that fails failure_threshold
+    times in a row is skipped for recovery_time seconds; when every endpoint is skipped the pool raises
+    NLUUnavailable right away.
+    """
+    def __init__(self, urls: List[str], balancing: str = "least_outstanding", timeout: Optional[float] = 10.0,
+                 hedge_quantile: Optional[float] = 0.95, min_hedge_delay: float = 0.05, latency_window: int = 200,
+                 failure_threshold: int = 3, recovery_time: float = 30.0, max_connections: int = 10):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+
+        urls
+            Equivalent endpoints, all of them /model/parse or all of them /model/parse_batch.
+        balancing
+            One of BALANCING.
+        timeout
+            Seconds to wait for each request, None to wait forever.
+        hedge_quantile
+            Latency quantile after which a duplicate request is sent, None to never hedge.
+        min_hedge_delay
+            Minimum seconds to wait before hedging.
+        latency_window
+            Amount of recent latencies used to compute the quantile.
+        failure_threshold
+            Consecutive failures that open the circuit breaker of an endpoint.
+        recovery_time
+            Seconds an endpoint is skipped after its circuit breaker opens.
+        max_connections
+            Connections kept alive per endpoint.
+        """
+        if not urls:
+            raise ValueError("An endpoint pool needs at least one url")
+        if balancing not in BALANCING:
+            raise ValueError("Unknown balancing {}, expected one of {}".format(balancing, BALANCING))
+        self.endpoints = [Endpoint(url) for url in urls]
+        self._balancing = balancing
+        self._timeout = timeout
+        self._hedge_quantile = hedge_quantile
+        self._min_hedge_delay = min_hedge_delay
+        self._failure_threshold = failure_threshold
+        self._recovery_time = recovery_time
+        self._latencies = deque(maxlen=latency_window)
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(urls), pool_maxsize=max_connections)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._executor = None
+        if hedge_quantile is not None:
+            self._executor = ThreadPoolExecutor(max_workers=2 * max_connections, thread_name_prefix="nlu-hedge")
+        self.hedged = 0
+
+    def post(self, payload: Any) -> Any:
+        """
+        Sends the payload as JSON to one endpoint and returns the decoded answer.
+
+        Raises
+        ------
+
+        NLUUnavailable
+            If every endpoint is skipped by its circuit breaker, or every attempt failed.
+        """
+        data = json.dumps(payload)
+        tried = []
+        while len(tried) < len(self.endpoints):
+            endpoint = self._choose(tried)
+            tried.append(endpoint)
+            try:
+                if self._executor is None:
+                    return self._send(endpoint, data)
+                return self._send_hedged(endpoint, data, tried)
+            except (requests.RequestException, ValueError):
+                continue
+        raise NLUUnavailable("No NLU endpoint answered")
+
+    def _choose(self, exclude: List[Endpoint]) -> Endpoint:
+        now = time.monotonic()
+        with self._lock:
+            candidates = [endpoint for endpoint in self.endpoints
+                          if endpoint.is_available(now) and endpoint not in exclude]
+            if not candidates:
+                raise NLUUnavailable("Every NLU endpoint is failing")
+            # Rotating the candidates breaks least_outstanding ties in round robin order.
+            offset = next(self._turn) % len(candidates)
+            candidates = candidates[offset:] + candidates[:offset]
+            if self._balancing == "least_outstanding":
+                return min(candidates, key=lambda endpoint: endpoint.outstanding)
+            return candidates[0]
+
+    def _send(self, endpoint: Endpoint, data: str) -> Any:
+        with self._lock:
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+        start = time.monotonic()
+        try:
+            response = self._session.post(endpoint.url, data=data, timeout=self._timeout)
+            response.raise_for_status()
+            answer = response.json()
+        except (requests.RequestException, ValueError):
+            self._record_failure(endpoint)
+            raise
+        finally:
+            with self._lock:
+                endpoint.outstanding -= 1
+        with self._lock:
+            endpoint.consecutive_failures = 0
+            self._latencies.append(time.monotonic() - start)
+        return answer
+
+    def _send_hedged(self, endpoint: Endpoint, data: str, tried: List[Endpoint]) -> Any:
+        futures = {self._executor.submit(self._send, endpoint, data)}
+        done, pending = wait(futures, timeout=self._hedge_delay())
+        if not done:
+            try:
+                backup = self._choose(tried)
+                tried.append(backup)
+            except NLUUnavailable:
+                # No other endpoint, hedge on the same one.
+                backup = endpoint
+            futures.add(self._executor.submit(self._send, backup, data))
+            with self._lock:
+                self.hedged += 1
+        error = None
+        while futures:
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _hedge_delay(self) -> Optional[float]:
+        with self._lock:
+            if len(self._latencies) < MIN_LATENCY_SAMPLES:
+                return None
+            latencies = sorted(self._latencies)
+        index = min(int(self._hedge_quantile * len(latencies)), len(latencies) - 1)
+        return max(latencies[index], self._min_hedge_delay)
+
+    def _record_failure(self, endpoint: Endpoint):
+        with self._lock:
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.consecutive_failures >= self._failure_threshold:
+                endpoint.open_until = time.monotonic() + self._recovery_time
+                endpoint.consecutive_failures = 0
+
+    def is_healthy(self) -> bool:
+        now = time.monotonic()
+        return any(endpoint.is_available(now) for endpoint in self.endpoints)
+
+    def model_version(self) -> Optional[str]:
+        """
+        Asks an available endpoint which model it is running.
+
+        Returns
+        -------
+
+        The "model_file" reported by /status, or None if no endpoint answered.
+        """
+        now = time.monotonic()
+        for endpoint in self.endpoints:
+            if endpoint.is_available(now):
+                try:
+                    status_url = endpoint.url.split("/model/")[0] + "/status"
+                    return self._session.get(status_url, timeout=self._timeout).json().get("model_file")
+                except (requests.RequestException, ValueError):
+                    continue
+        return None
+
+    def stats(self) -> List[dict]:
+        now = time.monotonic()
+        return [{"url": endpoint.url, "requests": endpoint.requests, "failures": endpoint.failures,
+                 "outstanding": endpoint.outstanding, "available": endpoint.is_available(now)}
+                for endpoint in self.endpoints]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+        self._session.close()
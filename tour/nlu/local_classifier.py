@@ -0,0 +1,162 @@
+"""
+In-process architecture classifier, an optional replacement for the architectures NLU server.
+
+Requirements are described by character n-grams weighted with TF-IDF, and each combination is
+compared by cosine similarity with the training examples of architectures_data/data/nlu.yml.
+Needs NumPy.
+"""
+import hashlib
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from rasa.shared.utils.io import read_yaml_file
+
+from tour.nlu.scorer import Scorer, combination_text
+
+ARCHITECTURES_NLU_PATH = r"architectures_data/data/nlu.yml"
+
+ENTITY_MARKUP = re.compile(r"\[([^\]]+)\]\([^)]*\)")
+WORD = re.compile(r"\w+")
+
+
+def load_examples(path: str) -> List[Tuple[str, str]]:
+    """
+    Reads the intent examples of a Rasa NLU training file.
+
+    Returns
+    -------
+
+    Pairs of intent name and example text, with the entity annotations removed.
+    """
+    examples = []
+    for item in read_yaml_file(path).get("nlu", []):
+        if "intent" not in item:
+            continue
+        for line in item.get("examples", "").splitlines():
+            line = line.strip()
+            if line.startswith("- "):
+                examples.append((item["intent"], ENTITY_MARKUP.sub(r"\1", line[2:])))
+    return examples
+
+
+def char_ngrams(text: str, min_n: int = 2, max_n: int = 4) -> Counter:
+    """
+    Counts the character n-grams inside each word of the text, like the char_wb analyzer.
+
+    Punctuation is ignored, so the n-grams of a combination are the sum of the n-grams of
+    its requirements.
+    """
+    grams = Counter()
+    for word in WORD.findall(text.lower()):
+        padded = " " + word + " "
+        for n in range(min_n, max_n + 1):
+            for i in range(len(padded) - n + 1):
+                grams[padded[i:i + n]] += 1
+    return grams
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+class LocalScorer(Scorer):
+    """
+    Scores every combination in a single matrix operation, without HTTP requests.
+    """
+    def __init__(self, nlu_path: str = ARCHITECTURES_NLU_PATH, min_n: int = 2, max_n: int = 4,
+                 max_cached_requirements: int = 10000):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+
+        nlu_path
+            Rasa NLU training file with the architecture intents.
+        min_n
+            Shortest character n-gram.
+        max_n
+            Longest character n-gram.
+        max_cached_requirements
+            Amount of requirement vectors kept before starting over.
+        """
+        super().__init__()
+        with open(nlu_path, "rb") as file:
+            self._version = "local-" + hashlib.sha1(file.read()).hexdigest()
+        examples = load_examples(nlu_path)
+        self._min_n = min_n
+        self._max_n = max_n
+        self._max_cached_requirements = max_cached_requirements
+        self._intents = sorted({intent for intent, _ in examples})
+        grams = [char_ngrams(text, min_n, max_n) for _, text in examples]
+        self._vocabulary = {gram: i for i, gram in enumerate(sorted(set().union(*grams)))}
+        counts = np.array([self._counts(example_grams) for example_grams in grams])
+        document_frequency = (counts > 0).sum(axis=0)
+        self._idf = np.log((1 + len(examples)) / (1 + document_frequency)) + 1
+        self._examples = _normalize(counts * self._idf)
+        self._example_intents = np.array([self._intents.index(intent) for intent, _ in examples])
+        self._requirement_counts = {}
+
+    def _counts(self, grams: Counter) -> np.ndarray:
+        row = np.zeros(len(self._vocabulary))
+        for gram, count in grams.items():
+            column = self._vocabulary.get(gram)
+            if column is not None:
+                row[column] = count
+        return row
+
+    def _requirement_vector(self, requirement: str) -> np.ndarray:
+        row = self._requirement_counts.get(requirement)
+        if row is None:
+            if len(self._requirement_counts) >= self._max_cached_requirements:
+                self._requirement_counts.clear()
+            row = self._counts(char_ngrams(requirement, self._min_n, self._max_n))
+            self._requirement_counts[requirement] = row
+        return row
+
+    def similarities(self, combinations: List[Sequence[str]]) -> np.ndarray:
+        """
+        Similarity of each combination with each architecture.
+
+        Returns
+        -------
+
+        Matrix with one row per combination and one column per intent, holding the best cosine
+        similarity with the examples of that intent.
+        """
+        columns = {requirement: i for i, requirement in
+                   enumerate(dict.fromkeys(req for combination in combinations for req in combination))}
+        requirements = np.stack([self._requirement_vector(requirement) for requirement in columns])
+        membership = np.zeros((len(combinations), len(columns)))
+        for row, combination in enumerate(combinations):
+            for requirement in combination:
+                membership[row, columns[requirement]] += 1
+        # A combination is the sum of its requirement vectors, so its products with the examples and
+        # its norm come from the ones of the requirements, without a vocabulary sized row per combination.
+        weighted = requirements * self._idf
+        gram = weighted @ weighted.T
+        norms = np.sqrt(np.maximum(((membership @ gram) * membership).sum(axis=1), 0))
+        norms[norms == 0] = 1
+        similarity = (membership @ (weighted @ self._examples.T)) / norms[:, None]
+        per_intent = np.empty((len(combinations), len(self._intents)))
+        for k in range(len(self._intents)):
+            per_intent[:, k] = similarity[:, self._example_intents == k].max(axis=1)
+        return per_intent
+
+    def score(self, combinations: List[Sequence[str]]) -> List[Dict[str, Any]]:
+        if not combinations:
+            return []
+        per_intent = self.similarities(combinations)
+        responses = []
+        for combination, row in zip(combinations, per_intent.tolist()):
+            ranking = sorted(({"name": name, "confidence": confidence} for name, confidence in zip(self._intents, row)),
+                             key=lambda intent: -intent["confidence"])
+            responses.append({"text": combination_text(combination), "intent": ranking[0], "intent_ranking": ranking})
+        return responses
+
+    def model_version(self) -> Optional[str]:
+        return self._version
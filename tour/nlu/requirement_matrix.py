@@ -0,0 +1,134 @@
+"""
+Scorer that classifies each requirement once and scores combinations from the per-requirement
+intent distributions, so the NLU cost grows linearly with the amount of requirements.
+Needs NumPy.
+"""
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from tour.nlu.scorer import Scorer, combination_text
+
+AGGREGATIONS = ("mean_log", "max", "weighted")
+MIN_PROBABILITY = 1e-6
+
+
+class RequirementMatrixScorer(Scorer):
+    """
+    Keeps an N x K matrix with the intent ranking of each requirement and scores every
+    combination by aggregating its rows.
+
+    Aggregations:
+
+    mean_log
+        Geometric mean of the probabilities (mean log-probability) of the requirements.
+    max
+        Highest probability given to the intent by any requirement.
+    weighted
+        Mean of the distributions, weighting each requirement by how sure the NLU was about it
+        (one minus the normalized entropy of its distribution).
+    """
+    def __init__(self, scorer: Scorer, aggregation: str = "mean_log", max_requirements: int = 10000):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+
+        scorer
+            Scorer used to classify each requirement alone.
+        aggregation
+            One of AGGREGATIONS.
+        max_requirements
+            Amount of requirement distributions kept before starting over.
+        """
+        super().__init__()
+        if aggregation not in AGGREGATIONS:
+            raise ValueError("Unknown aggregation {}, expected one of {}".format(aggregation, AGGREGATIONS))
+        self._scorer = scorer
+        self._aggregation = aggregation
+        self._max_requirements = max_requirements
+        self._distributions = {}
+        self._intents = []
+
+    def _update_distributions(self, requirements: List[str]):
+        missing = [requirement for requirement in requirements if requirement not in self._distributions]
+        if not missing:
+            return
+        if len(self._distributions) + len(missing) > self._max_requirements:
+            self._distributions = {requirement: self._distributions[requirement] for requirement in requirements
+                                   if requirement in self._distributions}
+        round_trips = self._scorer.round_trips
+        responses = self._scorer.score([(requirement,) for requirement in missing])
+        self.round_trips += self._scorer.round_trips - round_trips
+        for requirement, response in zip(missing, responses):
+            ranking = response.get("intent_ranking") or [response["intent"]]
+            distribution = {intent["name"]: intent["confidence"] for intent in ranking}
+            for name in distribution:
+                if name not in self._intents:
+                    self._intents.append(name)
+            self._distributions[requirement] = distribution
+
+    def matrix(self, requirements: List[str]) -> np.ndarray:
+        """
+        Get the N x K matrix of intent probabilities of the requirements, classifying the new ones.
+        Columns follow the order of the intents property.
+        """
+        self._update_distributions(requirements)
+        return np.array([[self._distributions[requirement].get(name, 0.0) for name in self._intents]
+                         for requirement in requirements])
+
+    @property
+    def intents(self) -> List[str]:
+        return list(self._intents)
+
+    def aggregate(self, probabilities: np.ndarray, membership: np.ndarray) -> np.ndarray:
+        """
+        Scores the combinations.
+
+        Parameters
+        ----------
+
+        probabilities
+            N x K matrix of intent probabilities per requirement.
+        membership
+            M x N matrix with 1 where the requirement belongs to the combination.
+
+        Returns
+        -------
+
+        M x K matrix of combination scores.
+        """
+        sizes = membership.sum(axis=1, keepdims=True)
+        if self._aggregation == "mean_log":
+            return np.exp(membership @ np.log(np.maximum(probabilities, MIN_PROBABILITY)) / sizes)
+        if self._aggregation == "max":
+            masked = np.where(membership[:, :, None] > 0, probabilities[None, :, :], -np.inf)
+            return masked.max(axis=1)
+        normalized = probabilities / np.maximum(probabilities.sum(axis=1, keepdims=True), MIN_PROBABILITY)
+        entropy = -(normalized * np.log(np.maximum(normalized, MIN_PROBABILITY))).sum(axis=1)
+        weights = 1 - entropy / np.log(max(probabilities.shape[1], 2))
+        weights = np.maximum(weights, MIN_PROBABILITY)
+        return (membership * weights) @ probabilities / (membership @ weights)[:, None]
+
+    def score(self, combinations: List[Sequence[str]]) -> List[Dict[str, Any]]:
+        if not combinations:
+            return []
+        requirements = list(dict.fromkeys(req for combination in combinations for req in combination))
+        columns = {requirement: i for i, requirement in enumerate(requirements)}
+        probabilities = self.matrix(requirements)
+        membership = np.zeros((len(combinations), len(requirements)))
+        for row, combination in enumerate(combinations):
+            for requirement in combination:
+                membership[row, columns[requirement]] = 1
+        scores = self.aggregate(probabilities, membership)
+        responses = []
+        for combination, row in zip(combinations, scores.tolist()):
+            ranking = sorted(({"name": name, "confidence": confidence} for name, confidence in zip(self._intents, row)),
+                             key=lambda intent: -intent["confidence"])
+            responses.append({"text": combination_text(combination), "intent": ranking[0], "intent_ranking": ranking})
+        return responses
+
+    def model_version(self) -> Optional[str]:
+        version = self._scorer.model_version()
+        return None if version is None else "{}:{}".format(self._aggregation, version)
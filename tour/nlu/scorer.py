@@ -0,0 +1,171 @@
+import abc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+from tour.nlu.endpoints import EndpointPool
+
+NLU_URL = "http://localhost:5001/model/parse"
+NLU_BATCH_URL = "http://localhost:5001/model/parse_batch"
+
+
+def combination_text(combination: Sequence[str]) -> str:
+    """
+    Builds the text sent to the NLU server for a combination of requirements.
+
+    Parameters
+    ----------
+
+    combination
+        Requirements of the combination, in order.
+
+    Returns
+    -------
+
+    Requirements joined the way the architectures NLU model expects them.
+    """
+    text = ""
+    for req in combination:
+        text += req + ", "
+    return text
+
+
+class Scorer(metaclass=abc.ABCMeta):
+    """
+    Classifies combinations of requirements with the architectures NLU model.
+    """
+    def __init__(self) -> None:
+        self.round_trips = 0
+
+    @abc.abstractmethod
+    def score(self, combinations: List[Sequence[str]]) -> List[Dict[str, Any]]:
+        """
+        Classifies each combination.
+
+        Parameters
+        ----------
+
+        combinations
+            Combinations of requirements to classify.
+
+        Returns
+        -------
+
+        One parse result per combination, in the same order, with at least
+        the "intent" key of the Rasa /model/parse response.
+        """
+        raise NotImplementedError
+
+    def model_version(self) -> Optional[str]:
+        """
+        Version of the NLU model behind the scorer.
+
+        Returns
+        -------
+
+        Identifier that changes when the model changes, or None if it is unknown.
+        """
+        return None
+
+
+class HttpScorer(Scorer):
+    """
+    Sends one /model/parse request per combination, over keep-alive connections.
+    """
+    def __init__(self, url: str = NLU_URL, pool: Optional[EndpointPool] = None) -> None:
+        """
+        Constructor.
+
+        Parameters
+        ----------
+
+        url
+            Parse endpoint of the NLU server, used when no pool is given.
+        pool
+            Pool of parse endpoints to balance the requests over.
+        """
+        super().__init__()
+        self._pool = pool if pool is not None else EndpointPool([url], hedge_quantile=None)
+
+    def score(self, combinations: List[Sequence[str]]) -> List[Dict[str, Any]]:
+        responses = []
+        for combination in combinations:
+            self.round_trips += 1
+            responses.append(self._post(combination))
+        return responses
+
+    def _post(self, combination: Sequence[str]) -> Dict[str, Any]:
+        return self._pool.post({"text": combination_text(combination)})
+
+    def model_version(self) -> Optional[str]:
+        return self._pool.model_version()
+
+
+class ConcurrentScorer(HttpScorer):
+    """
+    Sends the /model/parse requests from a thread pool, keeping up to max_in_flight of them
+    in flight over pooled connections.
+
+    Results are returned in the order of the combinations, so the winner is the same one the
+    sequential scorer finds.
+    """
+    def __init__(self, url: str = NLU_URL, max_in_flight: int = 8, pool: Optional[EndpointPool] = None) -> None:
+        """
+        Constructor.
+
+        Parameters
+        ----------
+
+        url
+            Parse endpoint of the NLU server, used when no pool is given.
+        max_in_flight
+            Maximum amount of concurrent requests, and of pooled connections.
+        pool
+            Pool of parse endpoints to balance the requests over.
+        """
+        super().__init__(url, pool if pool is not None else
+                         EndpointPool([url], hedge_quantile=None, max_connections=max_in_flight))
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="nlu-scorer")
+
+    def score(self, combinations: List[Sequence[str]]) -> List[Dict[str, Any]]:
+        responses = list(self._executor.map(self._post, combinations))
+        self.round_trips += len(combinations)
+        return responses
+
+    def close(self):
+        self._executor.shutdown()
+        self._pool.close()
+
+
+class BatchScorer(Scorer):
+    """
+    Sends the combinations in bulk to a batch parse endpoint, like the one
+    served by tour.nlu.batch_server.
+    """
+    def __init__(self, url: str = NLU_BATCH_URL, batch_size: int = 256, pool: Optional[EndpointPool] = None) -> None:
+        """
+        Constructor.
+
+        Parameters
+        ----------
+
+        url
+            Endpoint that accepts {"texts": [...]} and answers a list of parse results, used when no pool is given.
+        batch_size
+            Maximum amount of texts per request.
+        pool
+            Pool of batch endpoints to balance the requests over.
+        """
+        super().__init__()
+        self._pool = pool if pool is not None else EndpointPool([url], timeout=None, hedge_quantile=None)
+        self._batch_size = batch_size
+
+    def score(self, combinations: List[Sequence[str]]) -> List[Dict[str, Any]]:
+        texts = [combination_text(combination) for combination in combinations]
+        responses = []
+        for start in range(0, len(texts), self._batch_size):
+            self.round_trips += 1
+            responses.extend(self._pool.post({"texts": texts[start:start + self._batch_size]}))
+        return responses
+
+    def model_version(self) -> Optional[str]:
+        return self._pool.model_version()
@@ -1,4 +1,11 @@
-from typing import Dict, Any, List, Optional, Union
+from array import array
+from typing import TYPE_CHECKING, Dict, Any, List, Union
+
+if TYPE_CHECKING:
+    from tour.flows.compiled import CompiledFlow
+
+# Largest value of a cursor, which is an unsigned 16 bit integer.
+MAX_CURSOR = 0xFFFF
 
 
 def parse_topic(raw_topic: Dict[str, Any]) -> "Topic":
@@ -7,76 +14,101 @@ def parse_topic(raw_topic: Dict[str, Any]) -> "Topic":
         return Topic.from_dict(raw_topic)
 
 
+class FlowState:
+    """
+    Progress of one conversation over a compiled flow, one entry per topic index.
+
+    Cursors are unsigned 16 bit integers, from 0 to MAX_CURSOR. Moving through a topic never takes
+    them past the amount of explanations, examples, sub topics or questions of the topic, which
+    CompiledFlow keeps up to MAX_CURSOR. Topic.set_current_example can set any index in that range,
+    past the last example too, and rejects the others.
+    """
+    __slots__ = ("explained", "detail_level", "current_example", "current_sub_topic", "current_question")
+
+    def __init__(self, flow: "CompiledFlow"):
+        n = len(flow)
+        self.explained = bytearray(n)
+        # Default detail level is the middle one, computed by the compiled flow.
+        self.detail_level = array("H", flow.detail_levels)
+        self.current_example = array("H", bytes(2 * n))
+        self.current_sub_topic = array("H", bytes(2 * n))
+        self.current_question = array("H", bytes(2 * n))
+
+    def restart(self, start: int, end: int):
+        """
+        Restarts the topics with indexes start to end - 1, like Topic.restart does with each one.
+        """
+        self.explained[start:end] = bytes(end - start)
+        self.current_example[start:end] = array("H", bytes(2 * (end - start)))
+        self.current_sub_topic[start:end] = array("H", bytes(2 * (end - start)))
+
+    def is_fresh(self) -> bool:
+        """
+        Checks that no topic was explained or entered, as after creating or restarting the topics.
+        """
+        return self.explained.count(0) == len(self.explained) and \
+            self.current_sub_topic.count(0) == len(self.current_sub_topic)
+
+    def nbytes(self) -> int:
+        """
+        Bytes used by the progress values.
+        """
+        return len(self.explained) + sum(len(values) * values.itemsize for values in
+                                         (self.detail_level, self.current_example, self.current_sub_topic,
+                                          self.current_question))
+
+
 class Topic:
     """Topic to explain.
 
+    A topic is a view over one topic of a compiled flow, shared by every conversation, and the
+    FlowState of one conversation, which holds its progress. Views are cheap, sub topics are
+    created when they are needed.
+
     Author: Bruno.
     """
+    __slots__ = ("_flow", "_index", "_state")
 
     def __eq__(self, other):
-        return self._id == other._id
+        return self.get_id() == other.get_id()
 
     @staticmethod
     def from_dict(raw_topic: Dict[str, Any]) -> "Topic":
-        if raw_topic.get("examples") is None:
-            examples = []
-        else:
-            examples = raw_topic.get("examples")
-        if raw_topic.get("sub_topics") is None:
-            subtopics = []
-        else:
-            subtopics = [parse_topic(raw_topic) for raw_topic in raw_topic["sub_topics"]]
-        if raw_topic.get("questions") is None:
-            questions = []
-        else:
-            questions = raw_topic.get("questions")
-        return Topic(raw_topic["topic_id"],
-                     raw_topic["utters"],
-                     examples,
-                     subtopics,
-                     questions)
-
-    # noinspection PyTypeChecker
-    def __init__(
-            self,
-            topic_id: str,
-            utters_explanations: List[str],
-            examples: Optional[List[str]] = None,
-            sub_topics: Optional[List["Topic"]] = None,
-            questions: Optional[List[str]] = None
-    ):
+        from tour.flows.compiled import CompiledFlow
+        flow = CompiledFlow.from_raw(raw_topic["topic_id"], [raw_topic])
+        return Topic(flow, flow.roots[0], FlowState(flow))
+
+    def __init__(self, flow: "CompiledFlow", index: int, state: FlowState):
         """
         Constructor.
 
-        Author: Bruno.
+        Topics used to be built from their content, as Topic(topic_id, utters, examples, sub_topics,
+        questions). They are views over a compiled flow now, use Topic.from_dict to build one from
+        its content.
 
         Parameters
         ----------
-        topic_id
-            Identification for the topic.
-        utters_explanations
-            Possible explanations for the topic.
-        examples
-            Examples to give for the topic.
-        sub_topics
-            Sub topics of the topic.
-        questions
-            Questions to make to the user.
-        """
-        self._id = topic_id
-        self._utters_explanations = utters_explanations
-        # Default detail level is the middle one.
-        self._detail_level = int(len(utters_explanations) / 2)
-        self.is_explained = False
-
-        self._examples = [] if examples is None else examples
-        self._current_example = 0
-
-        self._sub_topics = [] if sub_topics is None else sub_topics
-        self._current_sub_topic = 0
-
-        self._questions = [] if questions is None else questions
-        self._current_question = 0
+        flow
+            Compiled flow with the content of the topic.
+        index
+            Index of the topic in the flow.
+        state
+            Progress of the conversation over the flow.
+        """
+        self._flow = flow
+        self._index = index
+        self._state = state
+
+    @property
+    def is_explained(self) -> bool:
+        return bool(self._state.explained[self._index])
+
+    @is_explained.setter
+    def is_explained(self, explained: bool):
+        self._state.explained[self._index] = explained
+
+    def _sub_topic(self, i: int) -> "Topic":
+        return Topic(self._flow, self._flow.children[self._index][i], self._state)
 
     def get(self) -> Dict[str, "Topic"]:
         """
@@ -89,10 +121,40 @@ class Topic:
         Dictionary with the current topic's information and
         each subtopic within the main topic.
         """
-        topics = {self._id: self}
-        for topic in self._sub_topics:
-            topics.update(topic.get())
-        return topics
+        # The sub topics, and theirs, come right after the topic in the compiled flow.
+        return {self._flow.ids[i]: Topic(self._flow, i, self._state)
+                for i in range(self._index, self._flow.ends[self._index])}
+
+    def find(self, topic_id: str) -> Union["Topic", None]:
+        """
+        Get the topic with that id among this topic and its sub topics, at any depth.
+
+        Returns
+        -------
+        The topic, or None if it is not under this topic.
+        """
+        index = self._flow.index.get(topic_id)
+        if index is None or not self._index <= index < self._flow.ends[self._index]:
+            return None
+        return Topic(self._flow, index, self._state)
+
+    def get_index(self) -> int:
+        """
+        Get the index of the topic in its compiled flow.
+        """
+        return self._index
+
+    def get_state(self) -> FlowState:
+        """
+        Get the progress of the conversation the topic belongs to.
+        """
+        return self._state
+
+    def get_compiled_flow(self) -> "CompiledFlow":
+        """
+        Get the compiled flow with the content of the topic.
+        """
+        return self._flow
 
     def set_current_example(self, example: int):
         """
@@ -105,8 +167,16 @@ class Topic:
 
         example
             new examples' index
+
+        Raises
+        ------
+
+        ValueError
+            If the index is negative or greater than MAX_CURSOR.
         """
-        self._current_example = example
+        if not 0 <= example <= MAX_CURSOR:
+            raise ValueError("Example index {} of topic {} is out of 0 to {}".format(example, self.get_id(), MAX_CURSOR))
+        self._state.current_example[self._index] = example
 
     def get_current_example(self) -> int:
         """
@@ -118,7 +188,7 @@ class Topic:
         -------
         The index of the current example.
         """
-        return self._current_example
+        return self._state.current_example[self._index]
 
     def get_explanation(self, mark_as_explained: bool = True) -> str:
         """Explains the topic. Marks the topic as explained.
@@ -130,10 +200,11 @@ class Topic:
         Utter associated to the explanation with current detail level.
         """
         if mark_as_explained:
-            self.is_explained = True
-        if self._detail_level >= len(self._utters_explanations):
-            self._detail_level = 0
-        return self._utters_explanations[self._detail_level]
+            self._state.explained[self._index] = True
+        utters_explanations = self._flow.utters[self._index]
+        if self._state.detail_level[self._index] >= len(utters_explanations):
+            self._state.detail_level[self._index] = 0
+        return utters_explanations[self._state.detail_level[self._index]]
     
 
     def get_example(self) -> str:
@@ -147,12 +218,13 @@ class Topic:
         Utter associated to the next example if the topic has any example,
         otherwise it returns a default utter.
         """
-        if self._current_example < len(self._examples):
-            example = self._examples[self._current_example]
-            self._current_example += 1
-            return example
+        examples = self._flow.examples[self._index]
+        current_example = self._state.current_example[self._index]
+        if current_example < len(examples):
+            self._state.current_example[self._index] = current_example + 1
+            return examples[current_example]
         else:
-            self._current_example = 0
+            self._state.current_example[self._index] = 0
             return "utter_sin_ejemplos"
 
     def get_question(self) -> str:
@@ -166,12 +238,13 @@ class Topic:
         Utter associated to the next question if the topic has any,
         otherwise it returns a default utter.
         """
-        if self._current_question < len(self._questions):
-            question = self._questions[self._current_question]
-            self._current_question += 1
-            return question
+        questions = self._flow.questions[self._index]
+        current_question = self._state.current_question[self._index]
+        if current_question < len(questions):
+            self._state.current_question[self._index] = current_question + 1
+            return questions[current_question]
         else:
-            self._current_question = 0
+            self._state.current_question[self._index] = 0
             return "utter_sin_question"
 
     def next(self) -> Union["Topic", None]:
@@ -183,13 +256,13 @@ class Topic:
         -------
         Next topic to explain.
         """
-        if not self.is_explained:
+        if not self._state.explained[self._index]:
             return self
 
-        if self._current_sub_topic < len(self._sub_topics):
-            topic = self._sub_topics[self._current_sub_topic]
-            self._current_sub_topic += 1
-            return topic
+        current_sub_topic = self._state.current_sub_topic[self._index]
+        if current_sub_topic < len(self._flow.children[self._index]):
+            self._state.current_sub_topic[self._index] = current_sub_topic + 1
+            return self._sub_topic(current_sub_topic)
 
         return None
 
@@ -198,11 +271,20 @@ class Topic:
 
         Author: Bruno.
         """
-        self.is_explained = False
-        self._current_example = 0
-        self._current_sub_topic = 0
-        for topic in self._sub_topics:
-            topic.restart()
+        # The sub topics, and theirs, come right after the topic in the compiled flow.
+        self._state.restart(self._index, self._flow.ends[self._index])
+
+    def get_path(self) -> List["Topic"]:
+        """
+        Get the topics from the top level topic to this one.
+        """
+        path = [self]
+        parent = self._flow.parents[self._index]
+        while parent >= 0:
+            path.append(Topic(self._flow, parent, self._state))
+            parent = self._flow.parents[parent]
+        path.reverse()
+        return path
 
     def get_id(self) -> str:
         """
@@ -214,7 +296,7 @@ class Topic:
         -------
         Topic's name.
         """
-        return self._id
+        return self._flow.ids[self._index]
 
     def set_explained(self, explained: bool):
         """
@@ -228,7 +310,7 @@ class Topic:
         explained
             Boolean value to set if the current topic is explained or not.
         """
-        self.is_explained = explained
+        self._state.explained[self._index] = explained
 
     @property
     def repeat(self) -> str:
@@ -241,14 +323,17 @@ class Topic:
         Utter associated to the explanation with next detail level if possible.
         Otherwise returns the utter for the maximum detail level.
         """
-        self._detail_level += 1
+        utters_explanations = self._flow.utters[self._index]
+        # Every level past the last one behaves like the last one, so it stops there.
+        detail_level = min(self._state.detail_level[self._index] + 1, len(utters_explanations))
+        self._state.detail_level[self._index] = detail_level
 
         """Se marca como explicado aunque no esta explicado bien"""
-        self.is_explained = True
-        if self._detail_level >= len(self._utters_explanations):
-            return self._utters_explanations[-1]  # -1 = last element.
+        self._state.explained[self._index] = True
+        if detail_level >= len(utters_explanations):
+            return utters_explanations[-1]  # -1 = last element.
 
-        return self._utters_explanations[self._detail_level]
+        return utters_explanations[detail_level]
 
     def get_amount_subtopics(self) -> int:
         """
@@ -260,4 +345,4 @@ class Topic:
         -------
         Returns the amount of subtopics that the current topic has.
         """
-        return self._current_sub_topic
+        return self._state.current_sub_topic[self._index]
@@ -23,18 +23,19 @@ class NextTopic(Visitor):
 
         Utter associated to the next explanation for a Sequential person.
         """
-        while len(it.get_to_explain()) > 0 and (it.get_to_explain()[-1].is_explained or it.topic_in_flow(it.get_to_explain()[-1])):
-            it.get_to_explain()[-1].get_explanation()
-            next_to_explain = it.get_to_explain()[-1].next()
+        while it.size() > 0 and (it.peek().is_explained or it.topic_in_flow(it.peek())):
+            topic = it.peek()
+            topic.get_explanation()
+            next_to_explain = topic.next()
             if next_to_explain is None:
                 it.pop_not_explained_topic()
             else:
                 it.append_topic_to_explain(next_to_explain)
 
-        if len(it.get_to_explain()) == 0:
+        if it.size() == 0:
             return "utter_final"
 
-        return it.get_to_explain()[-1].get_explanation()
+        return it.peek().get_explanation()
 
     def visit_global(self, it: ConversationFlow) -> str:
         """
@@ -46,8 +47,8 @@ class NextTopic(Visitor):
         -------
             Utter associated to the next topic.
         """
-        if it.get_to_explain()[-1].is_explained:
+        if it.peek().is_explained:
             it.pop_not_explained_topic()
-        if len(it.get_to_explain()) == 0:
+        if it.size() == 0:
             return "utter_final"
-        return it.get_to_explain()[-1].get_explanation()
+        return it.peek().get_explanation()